@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for a running classifier API, driven by legal_classifier_client.
+
+Modes:
+  single  - concurrent classify() calls, coalesced into batches by the client
+  batch   - classify_many() over the whole corpus
+  stream  - iter_classify() over a lazily generated corpus
+
+Reports throughput and per-call latency percentiles (single mode) or
+per-batch wall time (batch/stream modes).
+
+Usage: python benchmarks/load_benchmark.py [--url http://localhost:8000]
+       [--requests 2000] [--mode single] [--parallelism 4] [--concurrency 64] [--async]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from legal_classifier_client import AsyncClassifierClient, ClassifierClient
+from prepare_data import create_synthetic_data
+
+def build_corpus(n_requests):
+    """Cycle the synthetic training texts, numbered so every request is distinct."""
+    base = create_synthetic_data()['text'].tolist()
+    return [f"{base[i % len(base)]} No. {i}" for i in range(n_requests)]
+
+def run_sync(args, corpus):
+    """Run the benchmark with the thread-based client; returns (elapsed, latencies)."""
+    client = ClassifierClient(args.url, parallelism=args.parallelism, max_delay=args.max_delay)
+    with client:
+        client.health()
+        latencies = []
+        start = time.perf_counter()
+        if args.mode == 'single':
+            def timed(text):
+                t0 = time.perf_counter()
+                client.classify(text)
+                return time.perf_counter() - t0
+
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                latencies = list(pool.map(timed, corpus))
+        elif args.mode == 'batch':
+            client.classify_many(corpus)
+        else:
+            for _ in client.iter_classify(iter(corpus)):
+                pass
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+async def run_async(args, corpus):
+    """Run the benchmark with the asyncio client; returns (elapsed, latencies)."""
+    async with AsyncClassifierClient(args.url, parallelism=args.parallelism,
+                                     max_delay=args.max_delay) as client:
+        await client.health()
+        latencies = []
+        start = time.perf_counter()
+        if args.mode == 'single':
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def timed(text):
+                async with semaphore:
+                    t0 = time.perf_counter()
+                    await client.classify(text)
+                    return time.perf_counter() - t0
+
+            latencies = await asyncio.gather(*(timed(text) for text in corpus))
+        elif args.mode == 'batch':
+            await client.classify_many(corpus)
+        else:
+            async for _ in client.iter_classify(iter(corpus)):
+                pass
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the classifier API")
+    parser.add_argument('--url', default='http://localhost:8000', help='API base URL')
+    parser.add_argument('--requests', type=int, default=2000, help='Number of texts to classify')
+    parser.add_argument('--mode', choices=['single', 'batch', 'stream'], default='single')
+    parser.add_argument('--parallelism', type=int, default=4, help='Batches in flight')
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help='Concurrent classify() callers in single mode')
+    parser.add_argument('--max-delay', type=float, default=0.005,
+                        help='Seconds a call waits for others to join its batch')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Use the asyncio client')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.requests)
+    client_name = 'async' if args.use_async else 'sync'
+    print(f"Benchmarking {args.url}: {len(corpus)} texts, mode={args.mode}, "
+          f"client={client_name}, parallelism={args.parallelism}")
+
+    if args.use_async:
+        elapsed, latencies = asyncio.run(run_async(args, corpus))
+    else:
+        elapsed, latencies = run_sync(args, corpus)
+
+    print(f"Elapsed: {elapsed:.2f}s")
+    print(f"Throughput: {len(corpus) / elapsed:.1f} texts/s")
+    if latencies:
+        latencies_ms = np.array(latencies) * 1000
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        print(f"Latency: p50 {p50:.1f}ms  p95 {p95:.1f}ms  p99 {p99:.1f}ms  "
+              f"max {latencies_ms.max():.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark the fused LemmaTfidfVectorizer against the original
+TfidfVectorizer(preprocessor=lemmatize_text) pipeline.
+
+Checks that both produce identical matrices, then reports transform time
+and peak traced memory allocation for each.
+
+Usage: python benchmarks/vectorizer_benchmark.py [--docs 5000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from nlp_utils import lemmatize_text, LemmaTfidfVectorizer
+from prepare_data import create_synthetic_data
+
+VECTORIZER_PARAMS = dict(
+    max_features=1000,
+    preprocessor=lemmatize_text,
+    stop_words=None,
+    ngram_range=(1, 2),
+    min_df=1,
+    max_df=0.95
+)
+
+def build_corpus(n_docs):
+    """Build a corpus of templated documents from the synthetic training data."""
+    base = create_synthetic_data()['text'].tolist()
+    corpus = []
+    for i in range(n_docs):
+        text = base[i % len(base)]
+        corpus.append(f"{text} No. {i}, dated {1 + i % 28:02d}.{1 + i % 12:02d}.2024, amount {i * 37 % 10000} EUR. {text}")
+    return corpus
+
+def measure(vectorizer, corpus, repeat):
+    """
+    Return (best batch transform time, mean single-document transform time,
+    peak traced allocation per single-document call in bytes, batch matrix).
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        X = vectorizer.transform(corpus)
+        best = min(best, time.perf_counter() - start)
+
+    # Serving path: one document per call, as in /classify
+    sample = corpus[:500]
+    start = time.perf_counter()
+    for doc in sample:
+        vectorizer.transform([doc])
+    single = (time.perf_counter() - start) / len(sample)
+
+    peak = 0
+    tracemalloc.start()
+    for doc in sample:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        vectorizer.transform([doc])
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return best, single, peak, X
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--docs', type=int, default=5000, help='Number of documents to transform')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (best is reported)')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.docs)
+    print(f"Corpus: {len(corpus)} documents")
+
+    baseline = TfidfVectorizer(**VECTORIZER_PARAMS).fit(corpus)
+    fused = LemmaTfidfVectorizer(**VECTORIZER_PARAMS).fit(corpus)
+
+    if baseline.vocabulary_ != fused.vocabulary_:
+        print("❌ Vocabularies differ")
+        sys.exit(1)
+
+    # Warm up the lemmatizer dictionaries before measuring
+    lemmatize_text(corpus[0])
+
+    base_time, base_single, base_peak, X_base = measure(baseline, corpus, args.repeat)
+    fused_time, fused_single, fused_peak, X_fused = measure(fused, corpus, args.repeat)
+
+    if (X_base != X_fused).nnz:
+        print("❌ Transform outputs differ")
+        sys.exit(1)
+    print("✅ Identical vocabulary and CSR output")
+
+    print(f"\n{'':<22}{'batch (s)':>12}{'per doc (ms)':>16}{'peak/doc (KiB)':>18}")
+    print(f"{'TfidfVectorizer':<22}{base_time:>12.3f}{base_single * 1000:>16.3f}{base_peak / 1024:>18.1f}")
+    print(f"{'LemmaTfidfVectorizer':<22}{fused_time:>12.3f}{fused_single * 1000:>16.3f}{fused_peak / 1024:>18.1f}")
+    print(f"\nBatch speedup: {base_time / fused_time:.2f}x, "
+          f"single-document speedup: {base_single / fused_single:.2f}x, "
+          f"peak allocation per document: {fused_peak / base_peak:.0%} of baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Python client for the Legal Document Classifier API.
+"""
+
+from .async_client import AsyncClassifierClient
+from .client import ClassifierClient
+from .common import ClassificationResult, ClassifierError, RetryPolicy
+
+__all__ = [
+    'AsyncClassifierClient',
+    'ClassificationResult',
+    'ClassifierClient',
+    'ClassifierError',
+    'RetryPolicy',
+]
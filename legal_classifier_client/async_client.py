@@ -0,0 +1,217 @@
+"""
+Asyncio client for the Legal Document Classifier API.
+"""
+
+import asyncio
+import collections
+
+import httpx
+
+from .common import (
+    MAX_BATCH_SIZE,
+    RETRY_STATUS_CODES,
+    ClassifierError,
+    RetryPolicy,
+    parse_batch_response,
+    validate_text,
+)
+
+class AsyncClassifierClient:
+    """
+    Asyncio counterpart of ClassifierClient.
+
+    Concurrent classify() coroutines are coalesced into /classify/batch
+    requests of up to max_batch_size texts, with at most parallelism batches
+    in flight over pooled keep-alive connections. Texts the API would reject
+    are refused before they are queued.
+
+        async with AsyncClassifierClient("http://localhost:8000") as client:
+            results = await asyncio.gather(*(client.classify(t) for t in texts))
+            async for result in client.iter_classify(read_documents()):
+                ...
+    """
+
+    def __init__(self, base_url="http://localhost:8000", max_batch_size=MAX_BATCH_SIZE,
+                 parallelism=4, max_delay=0.005, timeout=30.0, retry=None, transport=None):
+        if not 1 <= max_batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"max_batch_size must be between 1 and {MAX_BATCH_SIZE}")
+
+        self.max_batch_size = max_batch_size
+        self.parallelism = parallelism
+        self.max_delay = max_delay
+        self.retry = retry or RetryPolicy()
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=parallelism, max_keepalive_connections=parallelism
+            ),
+        )
+        self._semaphore = None
+        self._queue = None
+        self._batcher = None
+        self._tasks = set()
+        self._closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Send pending calls, then release the connections."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._batcher is not None:
+            await self._queue.put(None)
+            await self._batcher
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._http.aclose()
+
+    async def health(self):
+        """Return the /health response body."""
+        response = await self._request('GET', '/health')
+        if response.status_code != 200:
+            raise ClassifierError(response.status_code, response.text)
+        return response.json()
+
+    async def classify(self, text):
+        """Classify one text; the call is batched with concurrent calls."""
+        validate_text(text)
+        if self._closed:
+            raise RuntimeError("Client is closed")
+        if self._batcher is None:
+            # Created lazily so they bind to the running event loop
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._run_batcher())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def classify_many(self, texts):
+        """Classify a list of texts; batches are sent concurrently and results keep the input order."""
+        return [result async for result in self.iter_classify(texts)]
+
+    async def iter_classify(self, texts):
+        """
+        Stream results for a sync or async iterable of texts, in input order.
+        The input is consumed lazily, with at most parallelism batches in flight.
+        """
+        in_flight = collections.deque()
+        try:
+            async for chunk in _achunked(texts, self.max_batch_size):
+                if len(in_flight) >= self.parallelism:
+                    for result in await in_flight.popleft():
+                        yield result
+                in_flight.append(asyncio.ensure_future(self.classify_batch(chunk)))
+            while in_flight:
+                for result in await in_flight.popleft():
+                    yield result
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def classify_batch(self, texts):
+        """Send one /classify/batch request (at most max_batch_size texts)."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.parallelism)
+        payload = [{'text': text} for text in texts]
+        async with self._semaphore:
+            response = await self._request('POST', '/classify/batch', json=payload)
+        return parse_batch_response(response)
+
+    async def _request(self, method, url, **kwargs):
+        """Send a request, retrying 429/503 responses and transport errors."""
+        attempt = 0
+        while True:
+            try:
+                response = await self._http.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt >= self.retry.max_retries:
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt))
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.retry.max_retries:
+                    return response
+                await asyncio.sleep(self.retry.delay(attempt, response.headers.get('Retry-After')))
+            attempt += 1
+
+    async def _run_batcher(self):
+        """Collect queued calls into batches and send each as a task."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                try:
+                    if remaining > 0:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        """
+        Send a coalesced batch and resolve its futures. If the server rejects
+        the batch as invalid, its texts are resent one by one so that only
+        the caller of the offending text gets the error.
+        """
+        try:
+            results = await self.classify_batch([text for text, _ in batch])
+        except ClassifierError as e:
+            if e.status_code != 422 or len(batch) == 1:
+                _fail(batch, e)
+                return
+            await asyncio.gather(*(self._send([item]) for item in batch))
+            return
+        except Exception as e:
+            _fail(batch, e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        if len(results) < len(batch):
+            _fail(batch[len(results):], ClassifierError(
+                200, f"Server returned {len(results)} results for {len(batch)} texts"
+            ))
+
+def _fail(batch, error):
+    """Resolve the pending futures of a batch with an error."""
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
+
+async def _achunked(texts, size):
+    """Split a sync or async iterable into lists of at most size items, lazily."""
+    chunk = []
+    if hasattr(texts, '__aiter__'):
+        async for text in texts:
+            chunk.append(text)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+    else:
+        for text in texts:
+            chunk.append(text)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
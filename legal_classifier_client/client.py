@@ -0,0 +1,204 @@
+"""
+Synchronous client for the Legal Document Classifier API.
+"""
+
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import httpx
+
+from .common import (
+    MAX_BATCH_SIZE,
+    RETRY_STATUS_CODES,
+    ClassifierError,
+    RetryPolicy,
+    chunked,
+    parse_batch_response,
+    validate_text,
+)
+
+_STOP = object()
+
+class ClassifierClient:
+    """
+    Thread-safe client with pooled keep-alive connections.
+
+    Individual classify() calls, from any number of threads, are coalesced
+    into /classify/batch requests of up to max_batch_size texts: a call waits
+    at most max_delay seconds for others to join its batch. Up to parallelism
+    batches are in flight at once. 429 and 503 responses and transport errors
+    are retried with exponential backoff. Texts the API would reject are
+    refused before they are queued, so one bad text cannot fail the calls
+    it would have been batched with.
+
+        with ClassifierClient("http://localhost:8000") as client:
+            result = client.classify("Supply agreement between ...")
+            for result in client.iter_classify(read_documents()):
+                ...
+    """
+
+    def __init__(self, base_url="http://localhost:8000", max_batch_size=MAX_BATCH_SIZE,
+                 parallelism=4, max_delay=0.005, timeout=30.0, retry=None, transport=None):
+        if not 1 <= max_batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"max_batch_size must be between 1 and {MAX_BATCH_SIZE}")
+
+        self.max_batch_size = max_batch_size
+        self.parallelism = parallelism
+        self.max_delay = max_delay
+        self.retry = retry or RetryPolicy()
+        self._http = httpx.Client(
+            base_url=base_url,
+            timeout=timeout,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=parallelism, max_keepalive_connections=parallelism
+            ),
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=parallelism, thread_name_prefix='classifier-client'
+        )
+        self._queue = queue.Queue()
+        self._batcher = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Send pending calls, then release the connections and worker threads."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            batcher = self._batcher
+        if batcher is not None:
+            self._queue.put(_STOP)
+            batcher.join()
+        self._executor.shutdown(wait=True)
+        self._http.close()
+
+    def health(self):
+        """Return the /health response body."""
+        response = self._request('GET', '/health')
+        if response.status_code != 200:
+            raise ClassifierError(response.status_code, response.text)
+        return response.json()
+
+    def classify(self, text):
+        """Classify one text; the call is batched with concurrent calls."""
+        return self.submit(text).result()
+
+    def submit(self, text):
+        """Queue one text for classification and return a Future of its result."""
+        validate_text(text)
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Client is closed")
+            if self._batcher is None:
+                self._batcher = threading.Thread(
+                    target=self._run_batcher, name='classifier-client-batcher', daemon=True
+                )
+                self._batcher.start()
+            # Queued under the lock, so close() cannot put the stop marker in between
+            self._queue.put((text, future))
+        return future
+
+    def classify_many(self, texts):
+        """Classify a list of texts; batches are sent concurrently and results keep the input order."""
+        return list(self.iter_classify(texts))
+
+    def iter_classify(self, texts):
+        """
+        Stream results for an iterable of texts, in input order.
+        The input is consumed lazily, with at most parallelism batches in flight.
+        """
+        in_flight = collections.deque()
+        for chunk in chunked(texts, self.max_batch_size):
+            if len(in_flight) >= self.parallelism:
+                yield from in_flight.popleft().result()
+            in_flight.append(self._executor.submit(self.classify_batch, chunk))
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+    def classify_batch(self, texts):
+        """Send one /classify/batch request (at most max_batch_size texts)."""
+        payload = [{'text': text} for text in texts]
+        return parse_batch_response(self._request('POST', '/classify/batch', json=payload))
+
+    def _request(self, method, url, **kwargs):
+        """Send a request, retrying 429/503 responses and transport errors."""
+        attempt = 0
+        while True:
+            try:
+                response = self._http.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt >= self.retry.max_retries:
+                    raise
+                time.sleep(self.retry.delay(attempt))
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.retry.max_retries:
+                    return response
+                time.sleep(self.retry.delay(attempt, response.headers.get('Retry-After')))
+            attempt += 1
+
+    def _run_batcher(self):
+        """Collect queued calls into batches and hand them to the worker pool."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch):
+        """
+        Send a coalesced batch and resolve its futures. If the server rejects
+        the batch as invalid, its texts are resent one by one so that only
+        the caller of the offending text gets the error.
+        """
+        try:
+            results = self.classify_batch([text for text, _ in batch])
+        except ClassifierError as e:
+            if e.status_code != 422 or len(batch) == 1:
+                _fail(batch, e)
+                return
+            for item in batch:
+                self._send([item])
+            return
+        except Exception as e:
+            _fail(batch, e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+        if len(results) < len(batch):
+            _fail(batch[len(results):], ClassifierError(
+                200, f"Server returned {len(results)} results for {len(batch)} texts"
+            ))
+
+def _fail(batch, error):
+    """Resolve the futures of a batch with an error."""
+    for _, future in batch:
+        future.set_exception(error)
@@ -0,0 +1,89 @@
+"""
+Types and retry policy shared by the sync and asyncio clients.
+"""
+
+import random
+from dataclasses import dataclass
+
+# Server-side limits of /classify/batch and of a single text
+MAX_BATCH_SIZE = 100
+MAX_TEXT_LENGTH = 10000
+
+# Status codes worth retrying: rate limited or temporarily unavailable
+RETRY_STATUS_CODES = (429, 503)
+
+@dataclass
+class ClassificationResult:
+    """Classification of one text."""
+    category: str
+    confidence: float
+    model_name: str = None
+    model_version: str = None
+
+class ClassifierError(Exception):
+    """Raised when the API answers with an error that is not retried (or retries ran out)."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(f"HTTP {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter. A numeric Retry-After header from
+    the server takes precedence over the computed delay.
+    """
+
+    def __init__(self, max_retries=5, backoff=0.1, max_backoff=5.0):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number attempt (0-based)."""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+def validate_text(text):
+    """Reject texts the API would refuse, before they are batched with other callers' texts."""
+    if not isinstance(text, str):
+        raise TypeError(f"text must be a str, got {type(text).__name__}")
+    if not 1 <= len(text) <= MAX_TEXT_LENGTH:
+        raise ValueError(f"text length must be between 1 and {MAX_TEXT_LENGTH}, got {len(text)}")
+
+def parse_batch_response(response):
+    """Turn a /classify/batch response into ClassificationResults."""
+    if response.status_code != 200:
+        try:
+            detail = response.json().get('detail', response.text)
+        except ValueError:
+            detail = response.text
+        raise ClassifierError(response.status_code, detail)
+
+    body = response.json()
+    # Per-result versions (A/B variants); older servers only report the primary's
+    batch_version = body.get('model_version')
+    return [
+        ClassificationResult(
+            category=item['category'],
+            confidence=item['confidence'],
+            model_name=item.get('model_name'),
+            model_version=item.get('model_version', batch_version),
+        )
+        for item in body['results']
+    ]
+
+def chunked(texts, size):
+    """Split an iterable into lists of at most size items, lazily."""
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,79 @@
+"""
+Batch scoring of a stored dataset with the trained model.
+Streams the dataset in column batches, reuses the cached lemma tokens when
+they match the installed lemmatizer, and writes predictions to a Parquet file.
+"""
+
+import argparse
+import pickle
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dataset import DatasetStore
+from nlp_utils import accepts_lemma_tokens, use_fused_vectorizer
+
+def featurize(vectorizer, batch):
+    """TF-IDF features for a batch, from cached lemma tokens when possible."""
+    if 'lemma_tokens' in batch and accepts_lemma_tokens(vectorizer):
+        return vectorizer.transform_tokens(batch['lemma_tokens'])
+    return vectorizer.transform(batch['text'])
+
+def batch_score(model_path='../src/model.pkl', output_path='../data/predictions.parquet',
+                split=None, batch_size=10000):
+    """
+    Score a split (or the whole dataset) and write doc_id, category,
+    predicted category and confidence to output_path.
+    """
+    with open(model_path, 'rb') as f:
+        pipeline = use_fused_vectorizer(pickle.load(f))
+    vectorizer = pipeline.named_steps['tfidf']
+    classifier = pipeline.named_steps['classifier']
+
+    store = DatasetStore()
+    columns = ['doc_id', 'text', 'category']
+    if store.lemma_cache_valid():
+        columns.append('lemma_tokens')
+
+    start_time = time.time()
+    n_scored = n_correct = 0
+    writer = None
+    try:
+        for batch in store.iter_batches(split, columns=columns, batch_size=batch_size):
+            probabilities = classifier.predict_proba(featurize(vectorizer, batch))
+            best = probabilities.argmax(axis=1)
+            predicted = classifier.classes_[best]
+
+            table = pa.table({
+                'doc_id': batch['doc_id'].values,
+                'category': batch['category'].values,
+                'predicted': predicted,
+                'confidence': probabilities[np.arange(len(best)), best],
+            })
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table)
+
+            n_scored += len(batch)
+            n_correct += int((predicted == batch['category'].values).sum())
+    finally:
+        if writer is not None:
+            writer.close()
+
+    elapsed = time.time() - start_time
+    print(f"Scored {n_scored} documents in {elapsed:.2f}s")
+    if n_scored:
+        print(f"Accuracy: {n_correct / n_scored:.3f}")
+        print(f"Predictions saved to {output_path}")
+    return n_scored
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the stored dataset with the trained model")
+    parser.add_argument('--split', choices=['train', 'test'], help='Split to score (default: all)')
+    parser.add_argument('--model', default='../src/model.pkl', help='Path to the trained model')
+    parser.add_argument('--output', default='../data/predictions.parquet', help='Output Parquet file')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Documents per batch')
+    args = parser.parse_args()
+
+    batch_score(args.model, args.output, args.split, args.batch_size)
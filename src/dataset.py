@@ -0,0 +1,185 @@
+"""
+Columnar dataset storage for training, evaluation and batch scoring.
+Corpora are stored as Parquet partitioned by split (split=train/, split=test/)
+with a content hash per document for deduplication, the stratified split
+assignment persisted alongside the data, and an optional cached column of
+lemma tokens. Reads are memory-mapped and can stream in column batches.
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs
+from sklearn.model_selection import train_test_split
+
+DEFAULT_DATASET_PATH = '../data/dataset'
+MANIFEST_FILE = '_manifest.json'
+SPLITS = ('train', 'test')
+
+def content_hash(text):
+    """Hash of a document's content, ignoring case and whitespace differences."""
+    normalized = ' '.join(str(text).split()).casefold()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+class DatasetStore:
+    """
+    Parquet-backed corpus with persisted split assignments.
+
+    Columns: doc_id (content hash), text, category, split and, when cached,
+    lemma_tokens (the output of nlp_utils.lemma_tokens for the text).
+    """
+
+    def __init__(self, path=DEFAULT_DATASET_PATH):
+        self.path = path
+        self._filesystem = pyarrow.fs.LocalFileSystem(use_mmap=True)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.path, MANIFEST_FILE)
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def manifest(self):
+        """Dataset metadata: row counts per split, split settings and cached columns."""
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write(self, df, test_size=0.2, random_state=42, cache_lemmas=False):
+        """
+        Store a corpus with 'text' and 'category' columns, replacing the
+        stored one.
+
+        Documents are deduplicated by content hash. Documents already in the
+        store keep their split assignment; new documents are split stratified
+        by category. Returns the stored DataFrame.
+        """
+        df = df[['text', 'category']].copy()
+        df['doc_id'] = df['text'].map(content_hash)
+
+        conflicts = df.groupby('doc_id')['category'].nunique()
+        n_conflicts = int((conflicts > 1).sum())
+        if n_conflicts:
+            print(f"Warning: {n_conflicts} duplicated documents have conflicting categories; keeping the first")
+        n_before = len(df)
+        df = df.drop_duplicates('doc_id', keep='first').reset_index(drop=True)
+        n_duplicates = n_before - len(df)
+
+        # Keep persisted assignments, split only documents new to the store
+        existing = {}
+        if self.exists():
+            stored = self._read_table(columns=['doc_id', 'split']).to_pydict()
+            existing = dict(zip(stored['doc_id'], stored['split']))
+        df['split'] = df['doc_id'].map(existing).astype(object)
+        new = df['split'].isna()
+        if new.any():
+            df.loc[new, 'split'] = self._assign_splits(df[new], test_size, random_state)
+
+        if cache_lemmas:
+            from nlp_utils import lemma_tokens
+            df['lemma_tokens'] = df['text'].map(lemma_tokens)
+
+        self._write_table(df)
+
+        counts = df['split'].value_counts()
+        manifest = {
+            'created': datetime.now().isoformat(),
+            'n_documents': len(df),
+            'n_duplicates_removed': n_duplicates,
+            'splits': {split: int(counts.get(split, 0)) for split in SPLITS},
+            'test_size': test_size,
+            'random_state': random_state,
+            'cached_columns': ['lemma_tokens'] if cache_lemmas else [],
+        }
+        if cache_lemmas:
+            from nlp_utils import lemmatizer_settings
+            manifest['lemmatizer'] = lemmatizer_settings()
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        return df
+
+    def lemma_cache_valid(self):
+        """
+        Whether the cached lemma_tokens column can be used: it was stored with
+        the installed simplemma version, languages and token pattern.
+        """
+        manifest = self.manifest()
+        if 'lemma_tokens' not in manifest['cached_columns']:
+            return False
+        from nlp_utils import lemmatizer_settings
+        if manifest.get('lemmatizer') != lemmatizer_settings():
+            print("Warning: cached lemma tokens were computed with other lemmatizer settings; ignoring them")
+            return False
+        return True
+
+    @staticmethod
+    def _assign_splits(df, test_size, random_state):
+        """
+        Stratified train/test assignment, falling back to unstratified when a
+        class has a single document or either side has fewer documents than
+        there are classes (small incremental writes).
+        """
+        if len(df) < 2:
+            return np.array(['train'] * len(df))
+        counts = df['category'].value_counts()
+        n_test = math.ceil(test_size * len(df))
+        n_train = len(df) - n_test
+        stratifiable = counts.min() >= 2 and min(n_test, n_train) >= len(counts)
+        stratify = df['category'] if stratifiable else None
+        train_idx, test_idx = train_test_split(
+            df.index, test_size=test_size, random_state=random_state, stratify=stratify
+        )
+        splits = pd.Series('train', index=df.index)
+        splits[test_idx] = 'test'
+        return splits.values
+
+    def _write_table(self, df):
+        """Replace the stored data with df, partitioned by split."""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = self.path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        ds.write_dataset(
+            table,
+            tmp_path,
+            format='parquet',
+            partitioning=['split'],
+            partitioning_flavor='hive',
+            basename_template='part-{i}.parquet',
+        )
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.rename(tmp_path, self.path)
+
+    def _dataset(self):
+        if not self.exists():
+            raise FileNotFoundError(f"Dataset not found: {self.path}")
+        return ds.dataset(
+            os.path.abspath(self.path),
+            format='parquet',
+            partitioning='hive',
+            filesystem=self._filesystem,
+        )
+
+    def _read_table(self, split=None, columns=None):
+        dataset = self._dataset()
+        filter_ = ds.field('split') == split if split else None
+        return dataset.to_table(columns=columns, filter=filter_)
+
+    def read(self, split=None, columns=None):
+        """Read a split (or everything) into a DataFrame."""
+        return self._read_table(split, columns).to_pandas()
+
+    def iter_batches(self, split=None, columns=None, batch_size=10000):
+        """Stream a split (or everything) as DataFrames of at most batch_size rows."""
+        dataset = self._dataset()
+        filter_ = ds.field('split') == split if split else None
+        for batch in dataset.to_batches(columns=columns, filter=filter_, batch_size=batch_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
@@ -0,0 +1,196 @@
+"""
+Keyword prefilter: a cheap first stage in front of the ML pipeline.
+Many documents announce their class in their first or last words
+("Supply agreement ...", "Lawsuit for ...", "... certificate request").
+Rules anchored at the start or end of the raw text are learned from the
+training data, compiled into one regex per anchor, and answer immediately
+when a rule fires; everything else falls back to the model.
+"""
+
+import json
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+
+# Prefilter settings (overridable via environment)
+PREFILTER_RULES = os.getenv('PREFILTER_RULES')
+PREFILTER_MIN_CONFIDENCE = float(os.getenv('PREFILTER_MIN_CONFIDENCE', '0.9'))
+
+# Only this many trailing characters are searched for suffix rules
+SUFFIX_WINDOW = 200
+
+_WORD_RE = re.compile(r'\w+')
+
+class KeywordPrefilter:
+    """
+    Start/end anchored keyword rules with per-rule confidences.
+
+    A rule is a sequence of lowercase words that must open (prefix) or close
+    (suffix) the text. Its confidence is the Laplace-smoothed precision
+    observed on the training data, so rules seen only a few times stay below
+    the serving threshold.
+    """
+
+    name = 'keyword-prefilter'
+
+    def __init__(self, rules=None, min_confidence=PREFILTER_MIN_CONFIDENCE, info=None):
+        self.rules = rules or []
+        self.min_confidence = min_confidence
+        self.info = info or {}
+        self._lock = threading.Lock()
+        self.stats = {'checked': 0, 'hits': 0}
+        self._compile()
+
+    @property
+    def version(self):
+        return self.info.get('training_date', 'unknown')
+
+    def _compile(self):
+        """Compile the rules above min_confidence into one regex per anchor."""
+        self._patterns = {}
+        for anchor in ('prefix', 'suffix'):
+            # Longest rules first, so the most specific alternative wins
+            rules = sorted(
+                (r for r in self.rules if r['anchor'] == anchor and r['confidence'] >= self.min_confidence),
+                key=lambda r: -len(r['words'])
+            )
+            if not rules:
+                continue
+            alternatives = '|'.join(
+                '(' + r'\W+'.join(re.escape(word) for word in rule['words']) + ')'
+                for rule in rules
+            )
+            if anchor == 'prefix':
+                pattern = r'\W*(?:' + alternatives + r')(?!\w)'
+            else:
+                pattern = r'(?<!\w)(?:' + alternatives + r')\W*$'
+            self._patterns[anchor] = (re.compile(pattern, re.IGNORECASE), rules)
+
+    def fit(self, texts, labels, max_words=3, min_support=3, min_precision=0.95):
+        """
+        Learn rules from training texts: every word sequence of up to max_words
+        opening or closing a text is a candidate, kept if it occurs in at least
+        min_support texts with at least min_precision of them in one class.
+        """
+        labels = list(labels)
+        counts = defaultdict(Counter)
+        for text, label in zip(texts, labels):
+            words = _WORD_RE.findall(text.lower())
+            for n in range(1, min(max_words, len(words)) + 1):
+                counts[('prefix', tuple(words[:n]))][label] += 1
+                counts[('suffix', tuple(words[-n:]))][label] += 1
+
+        rules = []
+        for (anchor, words), label_counts in counts.items():
+            support = sum(label_counts.values())
+            category, correct = label_counts.most_common(1)[0]
+            if support < min_support or correct / support < min_precision:
+                continue
+            rules.append({
+                'anchor': anchor,
+                'words': list(words),
+                'category': category,
+                'support': support,
+                'precision': correct / support,
+                'confidence': (correct + 1) / (support + 2),
+            })
+
+        self.rules = sorted(rules, key=lambda r: (r['anchor'], -r['confidence'], r['words']))
+        self.info = {'training_date': datetime.now().isoformat(), 'n_samples': len(labels)}
+        self._compile()
+        return self
+
+    def match(self, text):
+        """
+        Return (category, confidence) if a rule fires, else None.
+        Conflicting prefix and suffix rules defer to the model.
+        """
+        hits = []
+        prefix = self._patterns.get('prefix')
+        if prefix is not None:
+            m = prefix[0].match(text)
+            if m:
+                hits.append(prefix[1][m.lastindex - 1])
+        suffix = self._patterns.get('suffix')
+        if suffix is not None:
+            m = suffix[0].search(text, max(0, len(text) - SUFFIX_WINDOW))
+            if m:
+                hits.append(suffix[1][m.lastindex - 1])
+
+        if not hits or len({rule['category'] for rule in hits}) > 1:
+            return None
+        best = max(hits, key=lambda rule: rule['confidence'])
+        return best['category'], best['confidence']
+
+    def split(self, texts):
+        """
+        Answer what the rules can. Returns ({index: (category, confidence)},
+        indices left for the model) and updates the hit counters.
+        """
+        answered = {}
+        remaining = []
+        for i, text in enumerate(texts):
+            hit = self.match(text)
+            if hit is None:
+                remaining.append(i)
+            else:
+                answered[i] = hit
+        with self._lock:
+            self.stats['checked'] += len(texts)
+            self.stats['hits'] += len(answered)
+        return answered, remaining
+
+    def describe(self):
+        """Rule counts and stage hit rate since startup."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['hit_rate'] = stats['hits'] / stats['checked'] if stats['checked'] else 0.0
+        stats['rules'] = sum(len(rules) for _, rules in self._patterns.values())
+        stats['min_confidence'] = self.min_confidence
+        stats['version'] = self.version
+        return stats
+
+    def evaluate(self, texts, labels, model_predictions):
+        """
+        Compare the cascade (rules, then model) with the model alone.
+        Returns hit rate, rule precision, both accuracies and their delta.
+        """
+        texts, labels, model_predictions = list(texts), list(labels), list(model_predictions)
+        hits = correct_hits = cascade_correct = model_correct = 0
+        for text, label, predicted in zip(texts, labels, model_predictions):
+            hit = self.match(text)
+            cascade = predicted if hit is None else hit[0]
+            if hit is not None:
+                hits += 1
+                correct_hits += hit[0] == label
+            cascade_correct += cascade == label
+            model_correct += predicted == label
+
+        n = max(len(labels), 1)
+        return {
+            'n_samples': len(labels),
+            'hit_rate': hits / n,
+            'rule_precision': correct_hits / hits if hits else None,
+            'model_accuracy': model_correct / n,
+            'cascade_accuracy': cascade_correct / n,
+            'accuracy_delta': (cascade_correct - model_correct) / n,
+        }
+
+    def save(self, path, evaluation=None):
+        """Save the rules (and optionally their evaluation) as JSON."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'info': self.info,
+                'evaluation': evaluation or {},
+                'rules': self.rules,
+            }, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path, min_confidence=PREFILTER_MIN_CONFIDENCE):
+        """Load rules saved by save()."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['rules'], min_confidence=min_confidence, info=data.get('info'))
@@ -0,0 +1,208 @@
+"""
+Structured, non-blocking logging for the classification service.
+Records are put on a queue by the request handlers and written as JSON
+lines to stderr by a background thread, so a slow log sink never blocks
+the event loop.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+# Sampling and aggregation settings (overridable via environment)
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))
+LOG_SLOW_REQUEST_SECONDS = float(os.getenv('LOG_SLOW_REQUEST_SECONDS', '1.0'))
+LOG_STATS_PERIOD = float(os.getenv('LOG_STATS_PERIOD', '60'))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format log records as single-line JSON objects.
+    Structured fields passed as ``extra={'fields': {...}}`` are merged in.
+    """
+
+    def format(self, record):
+        payload = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that drops records instead of blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(level=None):
+    """
+    Route the root logger through a bounded queue drained by a background thread.
+    Safe to call more than once; only the first call installs the handlers.
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter())
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, respect_handler_level=True
+    )
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(level)
+
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer thread."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestLogSampler:
+    """
+    Decide whether a single request gets its own log line.
+    Errors and slow requests are always logged; successes are sampled.
+    """
+
+    def __init__(self, success_rate=LOG_SAMPLE_RATE, slow_threshold=LOG_SLOW_REQUEST_SECONDS):
+        self.success_rate = success_rate
+        self.slow_threshold = slow_threshold
+
+    def should_log(self, processing_time, error=False):
+        if error or processing_time >= self.slow_threshold:
+            return True
+        return random.random() < self.success_rate
+
+
+class RequestStats:
+    """
+    Per-period request counters, emitted as one summary log line per period
+    instead of one line per request.
+
+    After start() a background thread emits the summary every period, also
+    when no requests arrive; without it the summary is emitted by the first
+    request after the period has ended.
+    """
+
+    def __init__(self, logger, period=LOG_STATS_PERIOD):
+        self.logger = logger
+        self.period = period
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._reset(time.time())
+
+    def start(self):
+        """Start emitting the summary on a fixed cadence from a background thread."""
+        if self._thread is None and self.period > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='request-stats', daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and emit the pending summary."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.period):
+            self.flush()
+
+    def _reset(self, now):
+        self._period_start = now
+        self._counters = {}
+
+    def record(self, endpoint, n_texts=1, processing_time=0.0, error=False, categories=None):
+        """Add one request to the counters of the current period."""
+        now = time.time()
+
+        with self._lock:
+            counters = self._counters.setdefault(endpoint, {
+                'requests': 0,
+                'texts': 0,
+                'errors': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+                'categories': {},
+            })
+            counters['requests'] += 1
+            counters['texts'] += n_texts
+            counters['total_time'] += processing_time
+            counters['max_time'] = max(counters['max_time'], processing_time)
+            if error:
+                counters['errors'] += 1
+            for category in (categories if categories is not None else ()):
+                counters['categories'][category] = counters['categories'].get(category, 0) + 1
+
+            due = self._thread is None and now - self._period_start >= self.period
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Emit the summary for the current period and start a new one."""
+        now = time.time()
+
+        with self._lock:
+            endpoints = self._counters
+            period_start = self._period_start
+            self._reset(now)
+
+        if not endpoints:
+            return
+
+        for stats in endpoints.values():
+            stats['avg_time'] = stats['total_time'] / stats['requests']
+
+        self.logger.info("Request summary", extra={'fields': {
+            'period_seconds': round(now - period_start, 3),
+            'endpoints': endpoints,
+        }})
@@ -3,26 +3,31 @@ FastAPI application for legal document classification service.
 Provides REST API endpoints for classifying legal documents.
 """
 
+# Imported first: it records the interpreter's RSS before the heavy imports below
+from memory_report import MemoryTracker, MEMORY_DEBUG
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-import pickle
 import logging
 import time
-import os
-import json
 from typing import Dict, List, Optional
 from datetime import datetime
-from nlp_utils import lemmatize_text
+from model_registry import ModelRegistry
+from logging_utils import setup_logging, shutdown_logging, RequestLogSampler, RequestStats
 from prometheus_fastapi_instrumentator import Instrumentator
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# FastAPI, pydantic, sklearn, scipy and pandas are loaded by now
+memory_tracker = MemoryTracker()
+memory_tracker.mark_imports()
+
+# Configure logging (JSON records written from a background thread)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Per-request log sampling and per-period aggregated counters
+request_sampler = RequestLogSampler()
+request_stats = RequestStats(logger)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Legal Document Classifier API",
@@ -53,6 +58,7 @@ class ClassificationResponse(BaseModel):
     confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score")
     processing_time: float = Field(..., description="Processing time in seconds")
     model_version: str = Field(..., description="Model version/timestamp")
+    model_name: str = Field(..., description="Name of the model that answered")
 
 class HealthResponse(BaseModel):
     status: str = Field(..., description="Service status")
@@ -63,27 +69,21 @@ class HealthResponse(BaseModel):
 # Global variables
 model = None
 model_info = {}
+registry = None
 start_time = time.time()
 
 def load_model():
-    """Load the trained ML model."""
-    global model, model_info
+    """Load the trained ML models (the primary plus any A/B and shadow models)."""
+    global model, model_info, registry
     
     try:
-        # Load model
-        model_path = 'src/model.pkl'
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found: {model_path}")
-        
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        
-        # Load model info
-        info_path = 'src/model_info.json'
-        if os.path.exists(info_path):
-            with open(info_path, 'r', encoding='utf-8') as f:
-                model_info = json.load(f)
-        
+        # Load all configured models (MODEL_CONFIG), or only src/model.pkl
+        registry = ModelRegistry.from_config()
+        model = registry.primary.pipeline
+        model_info = registry.primary.info
+        if registry.near_duplicates is not None:
+            memory_tracker.register_cache('near_duplicates', registry.near_duplicates)
+
         logger.info("Model loaded successfully")
         return True
         
@@ -95,8 +95,20 @@ def load_model():
 async def startup_event():
     """Initialize the application on startup."""
     logger.info("Starting Legal Document Classifier API...")
+    request_stats.start()
+    if MEMORY_DEBUG:
+        memory_tracker.start()
     load_model()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending request counters and log records on shutdown."""
+    request_stats.stop()
+    if registry is not None:
+        registry.shutdown()
+    memory_tracker.stop()
+    shutdown_logging()
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     """Add processing time to response headers."""
@@ -154,29 +166,35 @@ async def classify_text(request: TextRequest):
     start_time = time.time()
     
     try:
-        # Make prediction
-        prediction = model.predict([request.text])[0]
-        probabilities = model.predict_proba([request.text])[0]
-        confidence = max(probabilities)
+        # Make prediction (shadow models score it in the background)
+        prediction, confidence, served_by = registry.classify([request.text])[0]
         
         processing_time = time.time() - start_time
         
-        # Log the request
-        logger.info(
-            f"Classification: text_length={len(request.text)}, "
-            f"category={prediction}, confidence={confidence:.3f}, "
-            f"time={processing_time:.3f}s"
-        )
+        # Aggregate the request; log it individually only if sampled or slow
+        request_stats.record('classify', 1, processing_time, categories=(prediction,))
+        if request_sampler.should_log(processing_time):
+            logger.info("Classification", extra={'fields': {
+                'text_length': len(request.text),
+                'category': prediction,
+                'confidence': round(float(confidence), 3),
+                'processing_time': processing_time,
+            }})
         
         return ClassificationResponse(
             category=prediction,
             confidence=confidence,
             processing_time=processing_time,
-            model_version=model_info.get('training_date', 'unknown')
+            model_version=served_by.version,
+            model_name=served_by.name
         )
     
     except Exception as e:
-        logger.error(f"Classification error: {e}")
+        request_stats.record('classify', 1, time.time() - start_time, error=True)
+        logger.error("Classification error", extra={'fields': {
+            'error': str(e),
+            'text_length': len(request.text),
+        }})
         raise HTTPException(
             status_code=500, 
             detail=f"Classification failed: {str(e)}"
@@ -217,24 +235,26 @@ async def classify_batch_texts(requests: List[TextRequest]):
     
     try:
         texts = [req.text for req in requests]
-        predictions = model.predict(texts)
-        probabilities = model.predict_proba(texts)
+        predictions = registry.classify(texts)
         
         results = []
-        for i, (text, pred, prob) in enumerate(zip(texts, predictions, probabilities)):
-            confidence = max(prob)
+        for text, (pred, confidence, served_by) in zip(texts, predictions):
             results.append({
                 "text": text,
                 "category": pred,
-                "confidence": confidence
+                "confidence": confidence,
+                "model_name": served_by.name,
+                "model_version": served_by.version
             })
         
         processing_time = time.time() - start_time
         
-        logger.info(
-            f"Batch classification: count={len(texts)}, "
-            f"time={processing_time:.3f}s"
-        )
+        request_stats.record('classify_batch', len(texts), processing_time, categories=[r["category"] for r in results])
+        if request_sampler.should_log(processing_time):
+            logger.info("Batch classification", extra={'fields': {
+                'count': len(texts),
+                'processing_time': processing_time,
+            }})
         
         return {
             "results": results,
@@ -243,7 +263,11 @@ async def classify_batch_texts(requests: List[TextRequest]):
         }
     
     except Exception as e:
-        logger.error(f"Batch classification error: {e}")
+        request_stats.record('classify_batch', len(requests), time.time() - start_time, error=True)
+        logger.error("Batch classification error", extra={'fields': {
+            'error': str(e),
+            'count': len(requests),
+        }})
         raise HTTPException(
             status_code=500, 
             detail=f"Batch classification failed: {str(e)}"
@@ -261,9 +285,21 @@ async def get_model_info():
     return {
         "model_info": model_info,
         "classes": model.classes_.tolist() if hasattr(model, 'classes_') else [],
-        "model_type": type(model).__name__
+        "model_type": type(model).__name__,
+        "registry": registry.describe()
     }
 
+if MEMORY_DEBUG:
+    @app.get("/debug/memory")
+    def debug_memory(top: int = 10, history: int = 60):
+        """
+        Memory footprint breakdown by component, the last history RSS
+        samples and, when MEMORY_TRACEMALLOC=1, the top allocation sites and
+        their growth since the previous call. Only registered when MEMORY_DEBUG=1.
+        """
+        models = registry.models.values() if registry is not None else None
+        return memory_tracker.report(models, top=top, history=history)
+
 if __name__ == "__main__":
     import uvicorn
     
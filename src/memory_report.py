@@ -0,0 +1,388 @@
+"""
+Memory accounting for the classification service.
+Breaks resident memory down by component (model arrays, vocabulary,
+lemmatizer data, caches, interpreter baseline), samples RSS over time and,
+when tracemalloc is enabled, reports the top allocation sites and their growth.
+
+Run as a script for a staged footprint report of a fresh serving process:
+    python src/memory_report.py --requests 1000 --tracemalloc
+"""
+
+import argparse
+import collections
+import gc
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import types
+
+# Opt-in settings (overridable via environment)
+MEMORY_DEBUG = os.getenv('MEMORY_DEBUG', '0') == '1'
+MEMORY_TRACEMALLOC = os.getenv('MEMORY_TRACEMALLOC', '0') == '1'
+MEMORY_SAMPLE_INTERVAL = float(os.getenv('MEMORY_SAMPLE_INTERVAL', '60'))
+MEMORY_HISTORY_SIZE = int(os.getenv('MEMORY_HISTORY_SIZE', '1440'))
+
+MIB = 1024 * 1024
+
+# Objects shared by everything; following them would count the whole interpreter
+_SKIP_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.CodeType,
+    types.FrameType,
+)
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+def peak_rss():
+    """Peak resident set size of this process in bytes."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+# RSS when this module was first imported. The service imports it before
+# anything heavy, so this is the bare interpreter
+INTERPRETER_RSS = current_rss()
+
+# Objects without references; counted per reference, not tracked in ``seen``
+_LEAF_TYPES = (str, bytes, int, float, bool)
+
+def deep_sizeof(*roots, seen=None):
+    """
+    Approximate total size in bytes of the objects reachable from roots.
+    Objects already in ``seen`` (a set of ids, updated in place) are skipped,
+    so a shared set attributes every object to the first component that reaches it.
+    Strings, bytes and numbers are counted per reference, which keeps ``seen``
+    small when walking the multi-million entry lemmatizer dictionaries.
+    """
+    seen = set() if seen is None else seen
+    getsizeof = sys.getsizeof
+    size = 0
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if type(obj) in _LEAF_TYPES:
+            size += getsizeof(obj)
+            continue
+        if obj is None or id(obj) in seen or isinstance(obj, _SKIP_TYPES):
+            continue
+        seen.add(id(obj))
+        size += getsizeof(obj)
+        if type(obj) is dict:
+            for key, value in obj.items():
+                for item in (key, value):
+                    if type(item) in _LEAF_TYPES:
+                        size += getsizeof(item)
+                    else:
+                        stack.append(item)
+        else:
+            stack.extend(gc.get_referents(obj))
+    return size
+
+def _lemmatizer_objects():
+    """Return (dictionary data, lemmatization cache) objects of simplemma, if available."""
+    try:
+        from simplemma import lemmatizer
+    except ImportError:
+        return None, None
+    return (
+        getattr(lemmatizer, '_legacy_dictionary_factory', None),
+        getattr(lemmatizer, '_legacy_lemmatizer', None),
+    )
+
+class MemoryTracker:
+    """
+    Tracks the memory footprint of the serving process.
+
+    The interpreter baseline is the RSS when this module was imported; call
+    mark_imports() once the application's modules are imported so they are
+    reported as their own component, start() to sample RSS in the
+    background, then report() for a breakdown at any time. Long-lived caches
+    can be added with register_cache() to be reported separately.
+    """
+
+    def __init__(self, sample_interval=MEMORY_SAMPLE_INTERVAL, history_size=MEMORY_HISTORY_SIZE):
+        self.sample_interval = sample_interval
+        self.history = collections.deque(maxlen=history_size)
+        self.baseline_rss = INTERPRETER_RSS
+        self.imports_rss = None
+        self._caches = {}
+        self._last_snapshot = None
+        self._dictionary_cache = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def mark_imports(self):
+        """Record the RSS once the application's modules are imported."""
+        self.imports_rss = current_rss()
+
+    def start(self, trace=MEMORY_TRACEMALLOC, trace_depth=1):
+        """Start background RSS sampling (and tracemalloc, if trace)."""
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start(trace_depth)
+        self.sample()
+
+        if self._thread is None and self.sample_interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='memory-sampler', daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop background RSS sampling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.sample_interval):
+            self.sample()
+
+    def sample(self):
+        """Append the current RSS (and traced memory, if tracing) to the history."""
+        entry = {'time': time.time(), 'rss_mib': current_rss() / MIB}
+        if tracemalloc.is_tracing():
+            entry['traced_mib'] = tracemalloc.get_traced_memory()[0] / MIB
+        self.history.append(entry)
+        return entry
+
+    def register_cache(self, name, obj):
+        """Report the objects reachable from obj as a cache called name."""
+        self._caches[name] = obj
+
+    def components(self, models=None):
+        """
+        Size in bytes of each component, the caches and each model's share.
+        models is a pipeline or an iterable of served models (objects with
+        name and pipeline attributes, as in the model registry). Objects are
+        attributed to the first component that reaches them, in the order
+        listed here.
+        """
+        models = _named_models(models)
+        seen = set()
+        sizes = collections.OrderedDict()
+        per_model = collections.OrderedDict(
+            (name, collections.OrderedDict()) for name in models
+        )
+
+        vectorizers = {}
+        for name, (_, pipeline) in models.items():
+            if hasattr(pipeline, 'named_steps'):
+                vectorizers[name] = pipeline.named_steps.get('tfidf')
+
+        for name in models:
+            vectorizer = vectorizers.get(name)
+            per_model[name]['vocabulary'] = deep_sizeof(
+                getattr(vectorizer, 'vocabulary_', None),
+                getattr(vectorizer, 'stop_words_', None),
+                seen=seen,
+            )
+        sizes['vocabulary'] = sum(m['vocabulary'] for m in per_model.values())
+
+        dictionaries, lemmatizer = _lemmatizer_objects()
+        sizes['lemmatizer_data'] = self._dictionary_size(dictionaries, seen)
+
+        caches = collections.OrderedDict()
+        caches['lemmatizer'] = deep_sizeof(lemmatizer, seen=seen)
+        for name in models:
+            per_model[name]['vectorizer_index'] = deep_sizeof(
+                getattr(vectorizers.get(name), '_ngram_index_', None), seen=seen
+            )
+        caches['vectorizer_index'] = sum(m['vectorizer_index'] for m in per_model.values())
+        for name, obj in self._caches.items():
+            caches[name] = deep_sizeof(obj, seen=seen)
+        sizes['caches'] = sum(caches.values())
+
+        for name, (obj, _) in models.items():
+            per_model[name]['model_arrays'] = deep_sizeof(obj, seen=seen)
+        sizes['model_arrays'] = sum(m['model_arrays'] for m in per_model.values())
+
+        return sizes, caches, per_model
+
+    def _dictionary_size(self, dictionaries, seen):
+        """
+        Size of the loaded lemmatizer dictionaries. They are immutable once
+        loaded and walking them takes seconds, so the size is only recomputed
+        when the number of loaded dictionaries changes.
+        """
+        loader = getattr(dictionaries, '_load_dictionary_from_disk', None)
+        loaded = loader.cache_info().currsize if hasattr(loader, 'cache_info') else None
+
+        cached = self._dictionary_cache
+        if loaded is not None and cached is not None and cached[0] == loaded:
+            seen.add(id(dictionaries))
+            return cached[1]
+
+        size = deep_sizeof(dictionaries, seen=seen)
+        self._dictionary_cache = (loaded, size)
+        return size
+
+    def top_allocations(self, limit=10):
+        """
+        Top allocation sites of the current tracemalloc snapshot and their
+        growth since the previous call. Empty if tracemalloc is not tracing.
+        """
+        if not tracemalloc.is_tracing():
+            return [], []
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        with self._lock:
+            previous, self._last_snapshot = self._last_snapshot, snapshot
+
+        top = [
+            {'site': str(stat.traceback), 'size_mib': stat.size / MIB, 'count': stat.count}
+            for stat in snapshot.statistics('lineno')[:limit]
+        ]
+        growth = []
+        if previous is not None:
+            growth = [
+                {'site': str(stat.traceback), 'size_diff_mib': stat.size_diff / MIB, 'count_diff': stat.count_diff}
+                for stat in snapshot.compare_to(previous, 'lineno')[:limit]
+                if stat.size_diff
+            ]
+        return top, growth
+
+    def growth(self):
+        """RSS change over the sampled history, in MiB and MiB per hour."""
+        if len(self.history) < 2:
+            return {'samples': len(self.history), 'rss_change_mib': 0.0, 'rss_mib_per_hour': 0.0}
+        first, last = self.history[0], self.history[-1]
+        change = last['rss_mib'] - first['rss_mib']
+        elapsed = last['time'] - first['time']
+        return {
+            'samples': len(self.history),
+            'period_seconds': elapsed,
+            'rss_change_mib': change,
+            'rss_mib_per_hour': change / elapsed * 3600 if elapsed > 0 else 0.0,
+        }
+
+    def report(self, models=None, top=10, history=60):
+        """
+        Full memory report as a JSON-serializable dict, with the top
+        allocation sites and the last history samples of the periodic RSS
+        history.
+        """
+        rss = current_rss()
+        sizes, caches, per_model = self.components(models)
+        top_allocations, allocation_growth = self.top_allocations(top)
+
+        # Without mark_imports() the imports end up in unattributed
+        baseline = self.baseline_rss
+        imports_rss = self.imports_rss if self.imports_rss is not None else baseline
+        breakdown = {
+            'interpreter_baseline': baseline / MIB,
+            'imports': (imports_rss - baseline) / MIB,
+        }
+        breakdown.update((name, size / MIB) for name, size in sizes.items())
+        breakdown['unattributed'] = (rss - imports_rss - sum(sizes.values())) / MIB
+
+        return {
+            'rss_mib': rss / MIB,
+            'peak_rss_mib': peak_rss() / MIB,
+            'breakdown_mib': breakdown,
+            'caches_mib': {name: size / MIB for name, size in caches.items()},
+            'models_mib': {
+                name: {component: size / MIB for component, size in model_sizes.items()}
+                for name, model_sizes in per_model.items()
+            },
+            'tracemalloc': tracemalloc.is_tracing(),
+            'top_allocations': top_allocations,
+            'allocation_growth': allocation_growth,
+            'growth': self.growth(),
+            'history': list(self.history)[-history:] if history > 0 else [],
+        }
+
+def _named_models(models):
+    """Map model name to (object to size, pipeline) for a pipeline or served models."""
+    if models is None:
+        return collections.OrderedDict()
+    if hasattr(models, 'named_steps'):
+        return collections.OrderedDict([('model', (models, models))])
+    return collections.OrderedDict(
+        (model.name, (model, model.pipeline)) for model in models
+    )
+
+def print_report(report, stages=()):
+    """Print a memory report in a readable form."""
+    if stages:
+        print("Staged RSS:")
+        for name, rss, delta in stages:
+            print(f"  {name:<28}{rss:>10.1f} MiB  (+{delta:.1f})")
+        print()
+
+    print(f"RSS: {report['rss_mib']:.1f} MiB (peak {report['peak_rss_mib']:.1f} MiB)")
+    print("\nBreakdown:")
+    for name, size in report['breakdown_mib'].items():
+        print(f"  {name:<28}{size:>10.2f} MiB")
+    print("\nCaches:")
+    for name, size in report['caches_mib'].items():
+        print(f"  {name:<28}{size:>10.2f} MiB")
+    if len(report['models_mib']) > 1:
+        print("\nModels:")
+        for name, sizes in report['models_mib'].items():
+            print(f"  {name:<28}{sum(sizes.values()):>10.2f} MiB")
+
+    if report['top_allocations']:
+        print("\nTop allocation sites:")
+        for stat in report['top_allocations']:
+            print(f"  {stat['size_mib']:>8.2f} MiB {stat['count']:>9} blocks  {stat['site']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory footprint report for the classification service")
+    parser.add_argument('--requests', type=int, default=1000, help='Classifications to run before reporting')
+    parser.add_argument('--top', type=int, default=10, help='Number of allocation sites to show')
+    parser.add_argument('--tracemalloc', action='store_true', help='Trace allocations (slower, adds overhead)')
+    args = parser.parse_args()
+
+    tracker = MemoryTracker(sample_interval=0)
+    tracker.start(trace=args.tracemalloc)
+
+    stages = []
+    def stage(name):
+        rss = current_rss() / MIB
+        previous = stages[-1][1] if stages else tracker.baseline_rss / MIB
+        stages.append((name, rss, rss - previous))
+
+    stage('interpreter baseline')
+
+    # Heavy imports happen here so the baseline above excludes them
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main as service
+    from prepare_data import create_synthetic_data
+    tracker.mark_imports()
+    stage('web stack + sklearn import')
+
+    if not service.load_model():
+        print("Failed to load model. Run train_model.py first.")
+        sys.exit(1)
+    stage('model loaded')
+
+    texts = create_synthetic_data()['text'].tolist()
+    service.model.predict(texts)
+    stage('lemmatizer warm')
+
+    for i in range(args.requests):
+        service.model.predict_proba([f"{texts[i % len(texts)]} No. {i}"])
+    stage(f'{args.requests} requests')
+
+    print_report(tracker.report(service.registry.models.values(), top=args.top), stages)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""
+Multi-model serving with shared featurization.
+Loads several model versions side by side: the primary model answers
+requests, A/B variants answer a configured share of traffic, and shadow
+models score every request in a background pool and log disagreements.
+Models whose fitted vectorizers are identical share one TF-IDF pass, and
+near-duplicates of already scored documents reuse their predictions.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from keyword_prefilter import KeywordPrefilter, PREFILTER_RULES, PREFILTER_MIN_CONFIDENCE
+from near_duplicate import NearDuplicateIndex, NEAR_DUP_MAX_ENTRIES, NEAR_DUP_THRESHOLD
+from nlp_utils import LemmaTfidfVectorizer, accepts_lemma_tokens, lemma_tokens, use_fused_vectorizer
+
+logger = logging.getLogger(__name__)
+
+# Registry settings (overridable via environment)
+MODEL_CONFIG = os.getenv('MODEL_CONFIG')
+SHADOW_WORKERS = int(os.getenv('SHADOW_WORKERS', '1'))
+SHADOW_MAX_PENDING = int(os.getenv('SHADOW_MAX_PENDING', '1000'))
+
+DEFAULT_CONFIG = {
+    'models': [
+        {
+            'name': 'primary',
+            'path': 'src/model.pkl',
+            'info': 'src/model_info.json',
+            'role': 'primary'
+        }
+    ]
+}
+
+ROLES = ('primary', 'ab', 'shadow')
+
+def load_config(config_path=MODEL_CONFIG):
+    """
+    Load the model registry configuration.
+
+    The JSON file lists models with a name, pickle path, optional info path,
+    a role (primary, ab or shadow) and, for A/B variants, a traffic share.
+    An optional "prefilter" entry ({"rules": path, "min_confidence": 0.9})
+    enables the keyword prefilter stage and an optional "near_duplicates"
+    entry ({"threshold": 0.9, "max_entries": 5000}) configures the
+    near-duplicate index. Without a configuration file only src/model.pkl is
+    served, with the prefilter taken from PREFILTER_RULES and the index
+    settings from NEAR_DUP_THRESHOLD and NEAR_DUP_MAX_ENTRIES.
+    """
+    if not config_path:
+        return DEFAULT_CONFIG
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def vectorizer_fingerprint(vectorizer):
+    """
+    Hash of a fitted vectorizer's parameters and learned state.
+    Equal fingerprints mean equal TF-IDF output for any input.
+    """
+    digest = hashlib.sha1()
+    digest.update(type(vectorizer).__name__.encode())
+    params = vectorizer.get_params()
+    for key in sorted(params):
+        value = params[key]
+        # Functions are compared by qualified name, not by address
+        if callable(value):
+            value = f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', value)}"
+        digest.update(f"{key}={value!r};".encode())
+    digest.update(repr(sorted(vectorizer.vocabulary_.items())).encode())
+    digest.update(np.ascontiguousarray(vectorizer.idf_).tobytes())
+    return digest.hexdigest()
+
+class ServedModel:
+    """
+    One loaded model version: the pipeline split into its vectorizer and
+    classifier, plus its role and routing settings.
+    """
+
+    def __init__(self, name, pipeline, info=None, role='primary', traffic=0.0):
+        if role not in ROLES:
+            raise ValueError(f"Unknown model role '{role}' for model '{name}'")
+
+        self.name = name
+        self.pipeline = use_fused_vectorizer(pipeline)
+        self.info = info or {}
+        self.role = role
+        self.traffic = float(traffic)
+        self.vectorizer = self.pipeline.named_steps['tfidf']
+        self.classifier = self.pipeline.named_steps['classifier']
+        self.feature_group = vectorizer_fingerprint(self.vectorizer)
+        # Whether precomputed lemma_tokens() can replace the vectorizer's own lemmatization
+        self.accepts_lemma_tokens = accepts_lemma_tokens(self.vectorizer)
+
+    @property
+    def version(self):
+        return self.info.get('training_date', 'unknown')
+
+    def score(self, X):
+        """Return (categories, confidences) for a precomputed feature matrix."""
+        probabilities = self.classifier.predict_proba(X)
+        best = probabilities.argmax(axis=1)
+        return self.classifier.classes_[best], probabilities[np.arange(len(best)), best]
+
+class ModelRegistry:
+    """
+    Holds the served models and routes requests between them.
+
+    Featurization is shared: each distinct fitted vectorizer transforms a
+    request once. When the routed models accept lemma tokens, a request is
+    lemmatized once and the tokens are reused by every other group that
+    accepts them, including shadow groups featurized in the background pool.
+    Evaluating a shadow model with the primary's vectorizer therefore costs
+    one extra classifier product per request, and one with a retrained
+    vocabulary one extra TF-IDF lookup on top.
+    """
+
+    def __init__(self, models, prefilter=None, near_duplicates=None,
+                 shadow_workers=SHADOW_WORKERS, shadow_max_pending=SHADOW_MAX_PENDING):
+        primaries = [m for m in models if m.role == 'primary']
+        if len(primaries) != 1:
+            raise ValueError(f"Exactly one primary model is required, got {len(primaries)}")
+
+        self.models = {m.name: m for m in models}
+        if len(self.models) != len(models):
+            raise ValueError("Model names must be unique")
+
+        self.primary = primaries[0]
+        self.prefilter = prefilter
+        self.ab_models = [m for m in models if m.role == 'ab']
+        self.shadow_models = [m for m in models if m.role == 'shadow']
+        # Lookups lemmatize every text; only worth it if misses can reuse the tokens
+        if near_duplicates is not None and not all(
+            m.accepts_lemma_tokens for m in [self.primary] + self.ab_models
+        ):
+            logger.warning(
+                "Near-duplicate index disabled: a served model's vectorizer cannot reuse lemma tokens"
+            )
+            near_duplicates = None
+        self.near_duplicates = near_duplicates
+
+        total_traffic = sum(m.traffic for m in self.ab_models)
+        if total_traffic > 1.0:
+            raise ValueError(f"A/B traffic shares add up to {total_traffic:.2f} > 1.0")
+
+        self.shadow_max_pending = shadow_max_pending
+        self._shadow_pool = None
+        if self.shadow_models:
+            self._shadow_pool = ThreadPoolExecutor(
+                max_workers=shadow_workers, thread_name_prefix='shadow-scoring'
+            )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.shadow_stats = {
+            m.name: {'scored': 0, 'disagreements': 0, 'dropped': 0, 'errors': 0}
+            for m in self.shadow_models
+        }
+
+        n_groups = len({m.feature_group for m in models})
+        logger.info(
+            f"Model registry: {len(models)} models, {n_groups} featurization groups"
+        )
+
+    @classmethod
+    def from_config(cls, config=None, **kwargs):
+        """Load all models listed in the configuration."""
+        config = config or load_config()
+        models = []
+        for entry in config['models']:
+            path = entry['path']
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Model file not found: {path}")
+            with open(path, 'rb') as f:
+                pipeline = pickle.load(f)
+
+            info = {}
+            info_path = entry.get('info')
+            if info_path and os.path.exists(info_path):
+                with open(info_path, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+
+            models.append(ServedModel(
+                entry['name'],
+                pipeline,
+                info=info,
+                role=entry.get('role', 'primary'),
+                traffic=entry.get('traffic', 0.0)
+            ))
+
+        prefilter = None
+        prefilter_config = config.get('prefilter') or {}
+        rules_path = prefilter_config.get('rules', PREFILTER_RULES)
+        if rules_path:
+            prefilter = KeywordPrefilter.load(
+                rules_path,
+                min_confidence=prefilter_config.get('min_confidence', PREFILTER_MIN_CONFIDENCE)
+            )
+
+        near_duplicates = None
+        index_config = config.get('near_duplicates') or {}
+        max_entries = index_config.get('max_entries', NEAR_DUP_MAX_ENTRIES)
+        if max_entries > 0:
+            near_duplicates = NearDuplicateIndex(
+                threshold=index_config.get('threshold', NEAR_DUP_THRESHOLD),
+                max_entries=max_entries
+            )
+        return cls(models, prefilter=prefilter, near_duplicates=near_duplicates, **kwargs)
+
+    def route(self, text):
+        """
+        Pick the model answering a text. A/B shares are assigned by a hash of
+        the text, so the same document is always answered by the same model.
+        """
+        if not self.ab_models:
+            return self.primary
+        bucket = (zlib.crc32(text.encode('utf-8')) % 10000) / 10000
+        threshold = 0.0
+        for model in self.ab_models:
+            threshold += model.traffic
+            if bucket < threshold:
+                return model
+        return self.primary
+
+    def featurize(self, texts, models, token_lists=None):
+        """
+        Feature matrices for the given models, keyed by feature group.
+        Each group is transformed once. token_lists, if given, are the
+        lemma_tokens() of the texts and replace the lemmatization of every
+        group that accepts them; when several remaining groups use the fused
+        vectorizer with the same token pattern, they share one lemmatization
+        pass.
+        """
+        groups = {}
+        for model in models:
+            groups.setdefault(model.feature_group, model)
+
+        features = {}
+        if token_lists is not None:
+            for group, model in groups.items():
+                if model.accepts_lemma_tokens:
+                    features[group] = model.vectorizer.transform_tokens(token_lists)
+        vectorizers = {
+            group: model.vectorizer for group, model in groups.items() if group not in features
+        }
+
+        if len(vectorizers) == 1:
+            group, vectorizer = next(iter(vectorizers.items()))
+            features[group] = vectorizer.transform(texts)
+            return features
+
+        token_patterns = {v.token_pattern for v in vectorizers.values()}
+        if len(token_patterns) == 1 and all(
+            isinstance(v, LemmaTfidfVectorizer) and v._can_fuse() for v in vectorizers.values()
+        ):
+            token_pattern = token_patterns.pop()
+            shared_tokens = [lemma_tokens(text, token_pattern) for text in texts]
+            for group, vectorizer in vectorizers.items():
+                features[group] = vectorizer.transform_tokens(shared_tokens)
+            return features
+
+        for group, vectorizer in vectorizers.items():
+            features[group] = vectorizer.transform(texts)
+        return features
+
+    def _shadows_need_tokens(self, routed):
+        """
+        Whether a shadow model could reuse the lemma tokens of a request: it
+        accepts them and its feature group is not computed for the routed models.
+        """
+        routed_groups = {m.feature_group for m in routed}
+        return any(
+            m.accepts_lemma_tokens and m.feature_group not in routed_groups
+            for m in self.shadow_models
+        )
+
+    def classify(self, texts):
+        """
+        Classify texts: the keyword prefilter answers what it can, the routed
+        models the rest. Returns a list of (category, confidence, answered_by)
+        per text, and hands the model-answered texts to the shadow models
+        without waiting for them.
+        """
+        if self.prefilter is None:
+            return self._classify_with_models(texts)
+
+        answered, remaining = self.prefilter.split(texts)
+        results = [None] * len(texts)
+        for i, (category, confidence) in answered.items():
+            results[i] = (category, confidence, self.prefilter)
+        if remaining:
+            model_results = self._classify_with_models([texts[i] for i in remaining])
+            for i, result in zip(remaining, model_results):
+                results[i] = result
+        return results
+
+    def _classify_with_models(self, texts):
+        """
+        Classify texts with the routed models. Near-duplicates of documents
+        the routed model already scored get the stored prediction; the rest
+        are scored, indexed and handed to the shadow models.
+        """
+        routes = [self.route(text) for text in texts]
+        if self.near_duplicates is None:
+            return self._score_routed(texts, routes)
+
+        token_lists = [lemma_tokens(text) for text in texts]
+        results = [None] * len(texts)
+        signatures = [None] * len(texts)
+        misses = []
+        for i, (tokens, model) in enumerate(zip(token_lists, routes)):
+            hit, signatures[i] = self.near_duplicates.lookup(tokens, model)
+            if hit is None:
+                misses.append(i)
+            else:
+                results[i] = (hit[0], hit[1], model)
+
+        if misses:
+            start_time = time.perf_counter()
+            scored = self._score_routed(
+                [texts[i] for i in misses],
+                [routes[i] for i in misses],
+                [token_lists[i] for i in misses]
+            )
+            self.near_duplicates.record_scoring(len(misses), time.perf_counter() - start_time)
+            for i, (category, confidence, model) in zip(misses, scored):
+                results[i] = (category, confidence, model)
+                self.near_duplicates.add(signatures[i], category, confidence, model)
+        return results
+
+    def _score_routed(self, texts, routes, token_lists=None):
+        """Score texts with their routed models and queue shadow scoring."""
+        routed = {model.name: model for model in routes}
+        # Lemmatize once for the routed and shadow groups, if the routed
+        # models would lemmatize the texts anyway
+        if (
+            token_lists is None
+            and self._shadows_need_tokens(routed.values())
+            and all(m.accepts_lemma_tokens for m in routed.values())
+        ):
+            token_lists = [lemma_tokens(text) for text in texts]
+        features = self.featurize(texts, list(routed.values()), token_lists)
+
+        results = [None] * len(texts)
+        for model in routed.values():
+            rows = [i for i, route in enumerate(routes) if route is model]
+            X = features[model.feature_group]
+            if len(rows) != len(texts):
+                X = X[rows]
+            categories, confidences = model.score(X)
+            for i, category, confidence in zip(rows, categories, confidences):
+                results[i] = (category, float(confidence), model)
+
+        if self.shadow_models:
+            self._submit_shadow(texts, features, results, token_lists)
+
+        return results
+
+    def _submit_shadow(self, texts, features, results, token_lists=None):
+        """Queue shadow scoring unless too many requests are already pending."""
+        with self._lock:
+            if self._pending >= self.shadow_max_pending:
+                for stats in self.shadow_stats.values():
+                    stats['dropped'] += 1
+                return
+            self._pending += 1
+
+        future = self._shadow_pool.submit(
+            self._score_shadow, texts, features, results, token_lists
+        )
+        future.add_done_callback(self._shadow_done)
+
+    def _shadow_done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _score_shadow(self, texts, features, results, token_lists=None):
+        """Score texts with every shadow model and log disagreements with the served answer."""
+        # Groups not computed on the hot path are featurized here, off it
+        missing = [m for m in self.shadow_models if m.feature_group not in features]
+        if missing:
+            features = dict(features, **self.featurize(texts, missing, token_lists))
+
+        for model in self.shadow_models:
+            stats = self.shadow_stats[model.name]
+            try:
+                categories, confidences = model.score(features[model.feature_group])
+            except Exception as e:
+                with self._lock:
+                    stats['errors'] += 1
+                logger.error("Shadow scoring error", extra={'fields': {
+                    'model': model.name,
+                    'error': str(e),
+                }})
+                continue
+
+            disagreements = 0
+            for text, (category, confidence, served_by), shadow_category, shadow_confidence in zip(
+                texts, results, categories, confidences
+            ):
+                if shadow_category == category:
+                    continue
+                disagreements += 1
+                logger.info("Shadow disagreement", extra={'fields': {
+                    'shadow_model': model.name,
+                    'served_model': served_by.name,
+                    'text_length': len(text),
+                    'category': category,
+                    'confidence': round(confidence, 3),
+                    'shadow_category': shadow_category,
+                    'shadow_confidence': round(float(shadow_confidence), 3),
+                }})
+
+            with self._lock:
+                stats['scored'] += len(texts)
+                stats['disagreements'] += disagreements
+
+    def describe(self):
+        """Summary of the served models, routing and shadow statistics."""
+        with self._lock:
+            shadow_stats = {name: dict(stats) for name, stats in self.shadow_stats.items()}
+            pending = self._pending
+        return {
+            'models': [
+                {
+                    'name': m.name,
+                    'role': m.role,
+                    'traffic': m.traffic if m.role == 'ab' else None,
+                    'model_version': m.version,
+                    'feature_group': m.feature_group[:12],
+                }
+                for m in self.models.values()
+            ],
+            'featurization_groups': len({m.feature_group for m in self.models.values()}),
+            'shadow_stats': shadow_stats,
+            'shadow_pending': pending,
+            'prefilter': self.prefilter.describe() if self.prefilter is not None else None,
+            'near_duplicates': self.near_duplicates.describe() if self.near_duplicates is not None else None,
+        }
+
+    def shutdown(self, wait=True):
+        """Stop the shadow pool, by default after pending shadow scoring completes."""
+        if self._shadow_pool is not None:
+            self._shadow_pool.shutdown(wait=wait)
@@ -0,0 +1,193 @@
+"""
+Near-duplicate index: reuse predictions for templated documents.
+Many submitted documents are the same template with different names, dates
+and amounts, so they get the same classification. Every scored document is
+summarized by a MinHash signature of its lemma shingles and indexed with LSH
+banding; a document whose estimated Jaccard similarity to an indexed one
+reaches the threshold gets the stored prediction without TF-IDF or scoring.
+"""
+
+import collections
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# Opt-in settings (overridable via environment): the index answers with
+# another document's prediction, so it is off unless NEAR_DUP_MAX_ENTRIES > 0.
+# An entry takes about 5 KB
+NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', '0.9'))
+NEAR_DUP_MAX_ENTRIES = int(os.getenv('NEAR_DUP_MAX_ENTRIES', '0'))
+
+# Words per shingle
+SHINGLE_SIZE = 3
+
+# MinHash permutations, split into LSH bands of NUM_PERM // BANDS rows.
+# With 16 bands of 8 rows a pair with similarity 0.9 shares a band with
+# probability > 0.9999, while pairs below ~0.7 rarely become candidates.
+NUM_PERM = 128
+BANDS = 16
+
+_Entry = collections.namedtuple(
+    '_Entry', ['signature', 'category', 'confidence', 'model_name', 'model_version']
+)
+
+def shingles(tokens, size=SHINGLE_SIZE):
+    """
+    Hashes of the word shingles of a token list. Tokens are lowercased and
+    numbers replaced by a placeholder, so dates and amounts do not count as
+    differences.
+    """
+    words = ['0' if token.isdigit() else token.lower() for token in tokens]
+    if len(words) < size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {
+        zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+        for i in range(len(words) - size + 1)
+    }
+
+class NearDuplicateIndex:
+    """
+    Bounded MinHash/LSH index of scored documents.
+
+    Entries store the prediction together with the name and version of the
+    model that made it; a lookup only matches entries of the model the text
+    is routed to, and entries of other versions of that model are dropped.
+    The least recently matched entries are evicted beyond max_entries.
+    """
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD, max_entries=NEAR_DUP_MAX_ENTRIES,
+                 num_perm=NUM_PERM, bands=BANDS, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands = bands
+        self._rows = num_perm // bands
+
+        # Multiply-shift hashing h(x) = (a * x + b) mod 2**64 >> 32 of the
+        # 32-bit shingle hashes, with random 64-bit a (odd) and b
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(0, 2 ** 64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 2 ** 64, size=num_perm, dtype=np.uint64)
+
+        self._entries = collections.OrderedDict()
+        self._buckets = [{} for _ in range(bands)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {'lookups': 0, 'hits': 0, 'inserts': 0, 'evictions': 0, 'stale': 0}
+        self._hits_by_model = collections.Counter()
+        self._lookup_seconds = 0.0
+        self._scored_texts = 0
+        self._scoring_seconds = 0.0
+
+    def signature(self, tokens):
+        """MinHash signature of a token list, or None if it has no words."""
+        hashes = shingles(tokens)
+        if not hashes:
+            return None
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        permuted = (values[:, None] * self._a + self._b) >> np.uint64(32)
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [band.tobytes() for band in signature.reshape(self.bands, self._rows)]
+
+    def lookup(self, tokens, model):
+        """
+        Find an indexed document similar to tokens and scored by model.
+        Returns ((category, confidence) or None, signature); pass the
+        signature to add() once a miss has been scored.
+        """
+        start = time.perf_counter()
+        signature = self.signature(tokens)
+        hit = None
+        with self._lock:
+            self.stats['lookups'] += 1
+            if signature is not None:
+                hit = self._find(signature, model)
+            self._lookup_seconds += time.perf_counter() - start
+        return hit, signature
+
+    def _find(self, signature, model):
+        """Best match at or above the threshold among the LSH candidates (lock held)."""
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(key, ()))
+
+        best, best_similarity = None, self.threshold
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            if entry.model_name != model.name:
+                continue
+            if entry.model_version != model.version:
+                self._remove(entry_id)
+                self.stats['stale'] += 1
+                continue
+            similarity = np.count_nonzero(entry.signature == signature) / self.num_perm
+            if similarity >= best_similarity:
+                best, best_similarity = entry_id, similarity
+
+        if best is None:
+            return None
+        self._entries.move_to_end(best)
+        entry = self._entries[best]
+        self.stats['hits'] += 1
+        self._hits_by_model[f"{entry.model_name}@{entry.model_version}"] += 1
+        return entry.category, entry.confidence
+
+    def add(self, signature, category, confidence, model):
+        """Index a scored document, evicting the least recently matched ones if full."""
+        if signature is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(signature, category, confidence, model.name, model.version)
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                bucket.setdefault(key, []).append(entry_id)
+            self.stats['inserts'] += 1
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def _remove(self, entry_id):
+        """Remove an entry and its band references (lock held)."""
+        entry = self._entries.pop(entry_id)
+        for bucket, key in zip(self._buckets, self._band_keys(entry.signature)):
+            ids = bucket[key]
+            ids.remove(entry_id)
+            if not ids:
+                del bucket[key]
+
+    def record_scoring(self, n_texts, seconds):
+        """Record the time the models took for texts the index missed."""
+        with self._lock:
+            self._scored_texts += n_texts
+            self._scoring_seconds += seconds
+
+    def describe(self):
+        """Size, hit rate and estimated time saved since startup."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['hits_by_model'] = dict(self._hits_by_model)
+            lookup_seconds = self._lookup_seconds
+            scored_texts = self._scored_texts
+            scoring_seconds = self._scoring_seconds
+
+        # A hit saves the average featurization + scoring time of a miss
+        cost_per_text = scoring_seconds / scored_texts if scored_texts else 0.0
+        stats['hit_rate'] = stats['hits'] / stats['lookups'] if stats['lookups'] else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['threshold'] = self.threshold
+        stats['scoring_seconds_per_text'] = cost_per_text
+        stats['lookup_seconds'] = lookup_seconds
+        stats['seconds_saved'] = stats['hits'] * cost_per_text
+        stats['net_seconds_saved'] = stats['seconds_saved'] - lookup_seconds
+        return stats
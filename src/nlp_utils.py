@@ -1,7 +1,20 @@
+import array
+import re
+
+import numpy as np
+import scipy.sparse as sp
 import simplemma
+from simplemma.lemmatizer import PUNCTUATION
+from simplemma.tokenizer import TOKREGEX
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.utils.validation import check_is_fitted
 
 LANGUAGES = ('ru', 'en', 'de', 'lt')
 
+# TfidfVectorizer's default token_pattern
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+_DEFAULT_FINDALL = re.compile(DEFAULT_TOKEN_PATTERN).findall
+
 def lemmatize_text(text):
     """
     Multilingual lemmatizer supporting Russian (ru), English (en),
@@ -12,3 +25,267 @@ def lemmatize_text(text):
     # Extract lemmas from text
     tokens = simplemma.text_lemmatizer(text, lang=LANGUAGES)
     return " ".join(tokens)
+
+def _split_lemma(lemma, findall):
+    """Split one lemma the way TfidfVectorizer's token_pattern splits the joined lemma string."""
+    # Lemmas are joined by spaces, so matches never span two lemmas.
+    # A purely alphanumeric lemma is a single \w\w+ match on its own.
+    if findall is None and len(lemma) > 1 and lemma.isalnum():
+        return (lemma,)
+    return (findall or _DEFAULT_FINDALL)(lemma)
+
+def lemma_tokens(text, token_pattern=DEFAULT_TOKEN_PATTERN):
+    """
+    Return the tokens TfidfVectorizer would extract from lemmatize_text(text),
+    without building and re-tokenizing the joined lemma string.
+    """
+    if not isinstance(text, str):
+        return []
+    findall = None if token_pattern == DEFAULT_TOKEN_PATTERN else re.compile(token_pattern).findall
+    return [
+        token
+        for lemma in simplemma.text_lemmatizer(text, lang=LANGUAGES)
+        for token in _split_lemma(lemma, findall)
+    ]
+
+class LemmaTfidfVectorizer(TfidfVectorizer):
+    """
+    TfidfVectorizer fused with the multilingual lemmatizer.
+
+    Configured like ``TfidfVectorizer(preprocessor=lemmatize_text, ...)`` and
+    produces the same vocabulary and matrices, but goes from raw text to
+    vocabulary ids in one pass: the lemmas are never joined and re-tokenized,
+    each surface token is mapped to vocabulary token ids once and memoized,
+    and n-grams are looked up by integer keys instead of n-gram strings.
+    """
+
+    # Maximum number of memoized surface tokens before the memo is reset
+    surface_cache_size = 100000
+
+    def _can_fuse(self):
+        """Whether the parameters match the lemmatize_text + word n-gram pipeline."""
+        return (
+            self.preprocessor is lemmatize_text
+            and self.analyzer == 'word'
+            and self.tokenizer is None
+            and self.stop_words is None
+            and self.input == 'content'
+        )
+
+    def build_analyzer(self):
+        if not self._can_fuse():
+            return super().build_analyzer()
+
+        token_pattern = self.token_pattern
+        min_n, max_n = self.ngram_range
+        decode = self.decode
+
+        def word_ngrams(tokens):
+            # Copied: token lists passed to fit_transform_tokens() may be cached
+            ngrams = list(tokens) if min_n == 1 else []
+            n_tokens = len(tokens)
+            for n in range(max(min_n, 2), min(max_n + 1, n_tokens + 1)):
+                for i in range(n_tokens - n + 1):
+                    ngrams.append(" ".join(tokens[i:i + n]))
+            return ngrams
+
+        if getattr(self, '_fitting_tokens', False):
+            return word_ngrams
+
+        def analyze(doc):
+            return word_ngrams(lemma_tokens(decode(doc), token_pattern))
+
+        return analyze
+
+    def _ngram_index(self):
+        """
+        Lookup tables derived from vocabulary_: token -> token id, per n-gram
+        order a mixed-radix key over token ids -> feature index, and the memo
+        of surface token -> token ids.
+        """
+        cached = getattr(self, '_ngram_index_', None)
+        if cached is not None and cached[0] is self.vocabulary_:
+            return cached[1]
+
+        token_ids = {}
+        ngram_ids = {}
+        for feature in self.vocabulary_:
+            tokens = feature.split(" ")
+            for token in tokens:
+                token_ids.setdefault(token, len(token_ids))
+            ngram_ids.setdefault(len(tokens), {})
+        radix = max(len(token_ids), 1)
+        for feature, feature_idx in self.vocabulary_.items():
+            key = 0
+            tokens = feature.split(" ")
+            for token in tokens:
+                key = key * radix + token_ids[token]
+            ngram_ids[len(tokens)][key] = feature_idx
+
+        index = (token_ids, ngram_ids, radix, {})
+        self._ngram_index_ = (self.vocabulary_, index)
+        return index
+
+    def _token_ids(self, doc, token_ids, surface_cache, findall):
+        """Map a document to vocabulary token ids (-1 for out-of-vocabulary tokens)."""
+        ids = []
+        if not isinstance(doc, str):
+            return ids
+
+        # Mirrors simplemma's get_lemmas_in_text: the first token of each
+        # sentence is lowercased before lemmatization.
+        initial = True
+        for token in TOKREGEX.findall(doc):
+            surface = token.lower() if initial else token
+            cached = surface_cache.get(surface)
+            if cached is None:
+                lemma = simplemma.lemmatize(surface, lang=LANGUAGES)
+                cached = tuple(token_ids.get(t, -1) for t in _split_lemma(lemma, findall))
+                if len(surface_cache) >= self.surface_cache_size:
+                    surface_cache.clear()
+                surface_cache[surface] = cached
+            if cached:
+                ids.extend(cached)
+            initial = token in PUNCTUATION
+        return ids
+
+    def _count_vocab(self, raw_documents, fixed_vocab):
+        if not fixed_vocab or not self._can_fuse() or getattr(self, '_fitting_tokens', False):
+            return super()._count_vocab(raw_documents, fixed_vocab)
+
+        token_ids, _, _, surface_cache = self._ngram_index()
+        findall = (
+            None if self.token_pattern == DEFAULT_TOKEN_PATTERN
+            else re.compile(self.token_pattern).findall
+        )
+        ids_per_doc = (
+            self._token_ids(self.decode(doc), token_ids, surface_cache, findall)
+            for doc in raw_documents
+        )
+        return self.vocabulary_, self._count_ids(ids_per_doc)
+
+    def _count_ids(self, ids_per_doc):
+        """Build the n-gram count matrix from per-document vocabulary token ids."""
+        _, ngram_ids, radix, _ = self._ngram_index()
+        min_n, max_n = self.ngram_range
+        orders = [(n, ngram_ids[n]) for n in range(min_n, max_n + 1) if n in ngram_ids]
+
+        j_indices = []
+        values = array.array('i')
+        indptr = [0]
+        for ids in ids_per_doc:
+            feature_counter = {}
+            for n, lookup in orders:
+                if n == 1:
+                    keys = ids
+                elif n == 2:
+                    keys = [a * radix + b for a, b in zip(ids, ids[1:]) if a >= 0 and b >= 0]
+                else:
+                    keys = []
+                    for i in range(len(ids) - n + 1):
+                        window = ids[i:i + n]
+                        if min(window) >= 0:
+                            key = 0
+                            for token_id in window:
+                                key = key * radix + token_id
+                            keys.append(key)
+                for key in keys:
+                    feature_idx = lookup.get(key)
+                    if feature_idx is not None:
+                        feature_counter[feature_idx] = feature_counter.get(feature_idx, 0) + 1
+            j_indices.extend(feature_counter.keys())
+            values.extend(feature_counter.values())
+            indptr.append(len(j_indices))
+
+        indices_dtype = np.int32 if indptr[-1] <= np.iinfo(np.int32).max else np.int64
+        X = sp.csr_matrix(
+            (
+                np.frombuffer(values, dtype=np.intc),
+                np.asarray(j_indices, dtype=indices_dtype),
+                np.asarray(indptr, dtype=indices_dtype),
+            ),
+            shape=(len(indptr) - 1, len(self.vocabulary_)),
+            dtype=self.dtype,
+        )
+        X.sort_indices()
+        return X
+
+    def transform_tokens(self, token_lists):
+        """
+        TF-IDF matrix for documents already split by lemma_tokens().
+        Lets several vectorizers with different vocabularies share one
+        lemmatization pass; equivalent to transform() on the raw documents.
+        """
+        check_is_fitted(self, msg="The TF-IDF vectorizer is not fitted")
+        token_ids = self._ngram_index()[0]
+        X = self._count_ids(
+            [token_ids.get(token, -1) for token in tokens] for tokens in token_lists
+        )
+        if self.binary:
+            X.data.fill(1)
+        return self._tfidf.transform(X, copy=False)
+
+    def fit_transform_tokens(self, token_lists, y=None):
+        """
+        Learn the vocabulary and idf from documents already split by
+        lemma_tokens() and return their TF-IDF matrix; equivalent to
+        fit_transform() on the raw documents.
+        """
+        if not accepts_lemma_tokens(self):
+            raise ValueError("Lemma tokens can only replace the default fused lemmatization")
+        self._fitting_tokens = True
+        try:
+            return self.fit_transform(token_lists, y)
+        finally:
+            del self._fitting_tokens
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        # Derived lookup tables are rebuilt lazily after unpickling
+        state.pop('_ngram_index_', None)
+        return state
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer):
+        """Build a fused vectorizer carrying over the parameters and fitted state of a TfidfVectorizer."""
+        fused = cls(**vectorizer.get_params())
+        fused.__dict__.update(vectorizer.__dict__)
+        return fused
+
+def accepts_lemma_tokens(vectorizer):
+    """Whether lemma_tokens() of a text can replace the vectorizer's own lemmatization."""
+    return (
+        isinstance(vectorizer, LemmaTfidfVectorizer)
+        and vectorizer._can_fuse()
+        and vectorizer.token_pattern == DEFAULT_TOKEN_PATTERN
+    )
+
+def lemmatizer_settings():
+    """
+    Settings that determine lemma_tokens() output. Cached lemma tokens are
+    only valid for the settings they were computed with.
+    """
+    return {
+        'simplemma_version': simplemma.__version__,
+        'languages': list(LANGUAGES),
+        'token_pattern': DEFAULT_TOKEN_PATTERN,
+    }
+
+def use_fused_vectorizer(pipeline, step='tfidf'):
+    """
+    Swap a fitted TfidfVectorizer(preprocessor=lemmatize_text) step of a Pipeline
+    for the equivalent LemmaTfidfVectorizer. Other pipelines are returned unchanged.
+    """
+    named_steps = getattr(pipeline, 'named_steps', {})
+    vectorizer = named_steps.get(step)
+    if type(vectorizer) is not TfidfVectorizer:
+        return pipeline
+
+    fused = LemmaTfidfVectorizer.from_vectorizer(vectorizer)
+    if not fused._can_fuse():
+        return pipeline
+
+    pipeline.steps = [
+        (name, fused if name == step else estimator) for name, estimator in pipeline.steps
+    ]
+    return pipeline
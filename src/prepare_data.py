@@ -4,8 +4,7 @@ Creates synthetic training data for the ML model.
 """
 
 import pandas as pd
-import os
-from sklearn.model_selection import train_test_split
+from dataset import DatasetStore
 
 def create_synthetic_data():
     """
@@ -85,7 +84,7 @@ def create_synthetic_data():
     
     return pd.DataFrame(data)
 
-def prepare_data():
+def prepare_data(cache_lemmas=True):
     """
     Prepare and save training data for the ML model.
     """
@@ -94,36 +93,20 @@ def prepare_data():
     # Create synthetic data
     df = create_synthetic_data()
     
-    # Ensure data directory exists
-    os.makedirs('../data', exist_ok=True)
-    
-    # Save full dataset
-    df.to_csv('../data/training_data.csv', index=False)
-    print(f"Saved {len(df)} training samples to ../data/training_data.csv")
+    # Store deduplicated data with persisted train/test assignments
+    store = DatasetStore()
+    stored = store.write(df, test_size=0.2, random_state=42, cache_lemmas=cache_lemmas)
+    print(f"Saved {len(stored)} training samples to {store.path}")
     
     # Display data distribution
     print("\nData distribution:")
-    print(df['category'].value_counts())
-    
-    # Split data for training and testing
-    X_train, X_test, y_train, y_test = train_test_split(
-        df['text'], df['category'], 
-        test_size=0.2, 
-        random_state=42,
-        stratify=df['category']
-    )
-    
-    # Save split datasets
-    train_df = pd.DataFrame({'text': X_train, 'category': y_train})
-    test_df = pd.DataFrame({'text': X_test, 'category': y_test})
-    
-    train_df.to_csv('../data/train.csv', index=False)
-    test_df.to_csv('../data/test.csv', index=False)
+    print(stored['category'].value_counts())
     
-    print(f"\nTraining set: {len(train_df)} samples")
-    print(f"Test set: {len(test_df)} samples")
+    splits = store.manifest()['splits']
+    print(f"\nTraining set: {splits['train']} samples")
+    print(f"Test set: {splits['test']} samples")
     
-    return df
+    return stored
 
 if __name__ == "__main__":
     prepare_data() 
\ No newline at end of file
@@ -3,18 +3,18 @@ ML model training script for legal document classification.
 Uses scikit-learn pipeline with TF-IDF vectorization and Naive Bayes classifier.
 """
 
-import pandas as pd
 import pickle
 import os
 import json
 from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import cross_val_score
 import numpy as np
-from nlp_utils import lemmatize_text
+from nlp_utils import lemmatize_text, accepts_lemma_tokens, LemmaTfidfVectorizer
+from keyword_prefilter import KeywordPrefilter
+from dataset import DatasetStore
 
 class LegalDocumentClassifier:
     """
@@ -28,9 +28,11 @@ class LegalDocumentClassifier:
     def create_pipeline(self):
         """
         Create the ML pipeline with TF-IDF vectorization and Logistic Regression classifier.
+        Lemmatization and n-gram lookup are fused into the vectorizer; its output
+        matches TfidfVectorizer(preprocessor=lemmatize_text) with the same parameters.
         """
         self.pipeline = Pipeline([
-            ('tfidf', TfidfVectorizer(
+            ('tfidf', LemmaTfidfVectorizer(
                 max_features=1000,
                 preprocessor=lemmatize_text,
                 stop_words=None,  # No stop words for Russian legal text
@@ -41,9 +43,20 @@ class LegalDocumentClassifier:
             ('classifier', LogisticRegression(C=1.0, max_iter=1000))
         ])
         
-    def train(self, X_train, y_train):
+    def featurize(self, texts, tokens=None):
         """
-        Train the model on the provided data.
+        TF-IDF features for texts, from their cached lemma tokens when the
+        vectorizer accepts them.
+        """
+        vectorizer = self.pipeline.named_steps['tfidf']
+        if tokens is not None and accepts_lemma_tokens(vectorizer):
+            return vectorizer.transform_tokens(tokens)
+        return vectorizer.transform(texts)
+        
+    def train(self, X_train, y_train, tokens=None):
+        """
+        Train the model on the provided data. tokens, if given, are the
+        cached lemma tokens of X_train and spare lemmatizing it again.
         """
         print("Training the legal document classifier...")
         
@@ -51,7 +64,12 @@ class LegalDocumentClassifier:
             self.create_pipeline()
         
         # Train the pipeline
-        self.pipeline.fit(X_train, y_train)
+        vectorizer = self.pipeline.named_steps['tfidf']
+        if tokens is not None and accepts_lemma_tokens(vectorizer):
+            X = vectorizer.fit_transform_tokens(tokens)
+            self.pipeline.named_steps['classifier'].fit(X, y_train)
+        else:
+            self.pipeline.fit(X_train, y_train)
         
         # Store training information
         self.model_info = {
@@ -63,15 +81,17 @@ class LegalDocumentClassifier:
         
         print("Model training completed!")
         
-    def evaluate(self, X_test, y_test):
+    def evaluate(self, X_test, y_test, tokens=None):
         """
-        Evaluate the model on test data.
+        Evaluate the model on test data (tokens: cached lemma tokens of X_test).
         """
         print("\nEvaluating model performance...")
         
         # Make predictions
-        y_pred = self.pipeline.predict(X_test)
-        y_proba = self.pipeline.predict_proba(X_test)
+        X = self.featurize(X_test, tokens)
+        classifier = self.pipeline.named_steps['classifier']
+        y_pred = classifier.predict(X)
+        y_proba = classifier.predict_proba(X)
         
         # Calculate metrics
         accuracy = accuracy_score(y_test, y_pred)
@@ -141,35 +161,56 @@ def train_model():
     """
     print("=== Legal Document Classifier Training ===")
     
-    # Load training data
-    try:
-        df = pd.read_csv('../data/training_data.csv')
-        print(f"Loaded {len(df)} training samples")
-    except FileNotFoundError:
+    # Load the persisted train/test splits
+    store = DatasetStore()
+    if not store.exists():
         print("Training data not found. Please run prepare_data.py first.")
         return None
     
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        df['text'], df['category'], 
-        test_size=0.2, 
-        random_state=42,
-        stratify=df['category']
-    )
+    # Reuse the lemma tokens cached by prepare_data.py if they are current
+    columns = ['text', 'category']
+    use_cached_lemmas = store.lemma_cache_valid()
+    if use_cached_lemmas:
+        columns.append('lemma_tokens')
+    train_df = store.read('train', columns=columns)
+    test_df = store.read('test', columns=columns)
+    print(f"Loaded {len(train_df) + len(test_df)} training samples")
+    
+    X_train, y_train = train_df['text'], train_df['category']
+    X_test, y_test = test_df['text'], test_df['category']
+    train_tokens = train_df['lemma_tokens'] if use_cached_lemmas else None
+    test_tokens = test_df['lemma_tokens'] if use_cached_lemmas else None
     
     print(f"Training set: {len(X_train)} samples")
     print(f"Test set: {len(X_test)} samples")
     
     # Create and train model
     classifier = LegalDocumentClassifier()
-    classifier.train(X_train, y_train)
+    classifier.train(X_train, y_train, train_tokens)
     
     # Evaluate model
-    evaluation_results = classifier.evaluate(X_test, y_test)
+    evaluation_results = classifier.evaluate(X_test, y_test, test_tokens)
     
     # Save model
     classifier.save_model()
     
+    # Learn the keyword prefilter and compare the cascade with the model alone
+    print("\n=== Keyword prefilter ===")
+    prefilter = KeywordPrefilter().fit(X_train, y_train)
+    model_predictions = classifier.pipeline.named_steps['classifier'].predict(
+        classifier.featurize(X_test, test_tokens)
+    )
+    cascade_results = prefilter.evaluate(X_test, y_test, model_predictions)
+    print(f"Rules: {len(prefilter.rules)}")
+    print(f"Prefilter hit rate: {cascade_results['hit_rate']:.3f}")
+    if cascade_results['rule_precision'] is not None:
+        print(f"Rule precision: {cascade_results['rule_precision']:.3f}")
+    print(f"Model accuracy: {cascade_results['model_accuracy']:.3f}")
+    print(f"Cascade accuracy: {cascade_results['cascade_accuracy']:.3f} "
+          f"(delta {cascade_results['accuracy_delta']:+.3f})")
+    prefilter.save('../src/prefilter_rules.json', cascade_results)
+    print("Prefilter rules saved to ../src/prefilter_rules.json")
+    
     # Test with some examples
     print("\n=== Testing with examples ===")
     test_examples = [
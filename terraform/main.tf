@@ -166,6 +166,18 @@ resource "aws_ecs_task_definition" "legal_classifier" {
           name  = "LOG_LEVEL"
           value = "INFO"
         },
+        {
+          name  = "LOG_SAMPLE_RATE"
+          value = "0.01"
+        },
+        {
+          name  = "LOG_SLOW_REQUEST_SECONDS"
+          value = "1.0"
+        },
+        {
+          name  = "NEAR_DUP_MAX_ENTRIES"
+          value = "0"
+        },
         {
           name  = "AWS_REGION"
           value = var.aws_region
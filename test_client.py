@@ -0,0 +1,91 @@
+"""
+Tests for the Python client's request coalescing, run against a mock transport.
+Run with: python -m pytest test_client.py
+"""
+
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+
+from legal_classifier_client import AsyncClassifierClient, ClassifierClient, ClassifierError
+
+class MockServer:
+    """Answers /classify/batch like the API and rejects the whole batch if any text contains 'invalid'."""
+
+    def __init__(self, drop_results=0):
+        self.batches = []
+        self.drop_results = drop_results
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        texts = [item['text'] for item in json.loads(request.content)]
+        with self._lock:
+            self.batches.append(texts)
+        if any('invalid' in text for text in texts):
+            return httpx.Response(422, json={'detail': 'invalid text'})
+        results = [
+            {'text': text, 'category': 'contract', 'confidence': 0.9,
+             'model_name': 'primary', 'model_version': 'v1'}
+            for text in texts
+        ]
+        if self.drop_results:
+            results = results[:-self.drop_results]
+        return httpx.Response(200, json={'results': results, 'processing_time': 0.0, 'model_version': 'v0'})
+
+def make_client(server, **kwargs):
+    return ClassifierClient('http://test', max_delay=0.05, transport=httpx.MockTransport(server), **kwargs)
+
+def test_invalid_text_is_rejected_before_batching():
+    server = MockServer()
+    with make_client(server) as client:
+        with pytest.raises(ValueError):
+            client.submit('')
+        with pytest.raises(ValueError):
+            client.submit('x' * 10001)
+    assert server.batches == []
+
+def test_rejected_batch_only_fails_offending_caller():
+    server = MockServer()
+    with make_client(server) as client:
+        futures = [client.submit(text) for text in ('one', 'invalid', 'two', 'three')]
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result(timeout=5).category)
+            except ClassifierError as e:
+                outcomes.append(e.status_code)
+
+    assert outcomes == ['contract', 422, 'contract', 'contract']
+    # One coalesced batch, then each text on its own
+    assert len(server.batches[0]) == 4
+
+def test_missing_results_fail_instead_of_hanging():
+    server = MockServer(drop_results=1)
+    with make_client(server) as client:
+        futures = [client.submit(text) for text in ('one', 'two')]
+        assert futures[0].result(timeout=5).category == 'contract'
+        with pytest.raises(ClassifierError):
+            futures[1].result(timeout=5)
+
+def test_result_carries_per_item_model_version():
+    with make_client(MockServer()) as client:
+        assert client.classify('one').model_version == 'v1'
+
+@pytest.mark.asyncio
+async def test_async_rejected_batch_only_fails_offending_caller():
+    server = MockServer()
+    client = AsyncClassifierClient('http://test', max_delay=0.05, transport=httpx.MockTransport(server))
+    async with client:
+        with pytest.raises(ValueError):
+            await client.classify('')
+        outcomes = await asyncio.gather(
+            *(client.classify(text) for text in ('one', 'invalid', 'two')),
+            return_exceptions=True
+        )
+
+    assert [o.category for o in (outcomes[0], outcomes[2])] == ['contract', 'contract']
+    assert isinstance(outcomes[1], ClassifierError) and outcomes[1].status_code == 422
+    assert len(server.batches[0]) == 3
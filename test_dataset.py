@@ -0,0 +1,41 @@
+"""
+Tests for the Parquet dataset store's persisted split assignments.
+Run with: python -m pytest test_dataset.py
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from dataset import DatasetStore
+
+def make_corpus(n_per_class, offset=0):
+    rows = []
+    for category in ('contract', 'lawsuit'):
+        for i in range(offset, offset + n_per_class):
+            rows.append({'text': f'{category} document number {i}', 'category': category})
+    return pd.DataFrame(rows)
+
+def test_incremental_write_keeps_existing_splits(tmp_path):
+    store = DatasetStore(str(tmp_path / 'dataset'))
+    first = store.write(make_corpus(20))
+    assert set(first['split']) == {'train', 'test'}
+
+    # A small batch of new documents: too few to stratify the test side
+    corpus = pd.concat([make_corpus(20), make_corpus(2, offset=20)], ignore_index=True)
+    second = store.write(corpus)
+
+    before = dict(zip(first['doc_id'], first['split']))
+    after = dict(zip(second['doc_id'], second['split']))
+    assert len(after) == 44
+    assert all(after[doc_id] == split for doc_id, split in before.items())
+    new_ids = set(after) - set(before)
+    assert len(new_ids) == 4
+    assert all(after[doc_id] in ('train', 'test') for doc_id in new_ids)
+
+    stored = store.read(columns=['doc_id', 'split'])
+    assert dict(zip(stored['doc_id'], stored['split'])) == after
+    assert store.manifest()['splits'] == second['split'].value_counts().to_dict()
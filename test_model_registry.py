@@ -0,0 +1,203 @@
+"""
+Tests for model routing, shared featurization, shadow scoring and the
+prefilter and near-duplicate stages of the model registry, with small
+pipelines trained in memory.
+Run with: python -m pytest test_model_registry.py
+"""
+
+import copy
+import os
+import sys
+
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import model_registry
+from keyword_prefilter import KeywordPrefilter
+from model_registry import ModelRegistry, ServedModel
+from near_duplicate import NearDuplicateIndex
+from nlp_utils import LemmaTfidfVectorizer, lemmatize_text
+from prepare_data import create_synthetic_data
+
+# Every label moved to the next category, so a model trained on it disagrees
+SHIFTED = {'contract': 'lawsuit', 'lawsuit': 'complaint', 'complaint': 'request', 'request': 'contract'}
+
+@pytest.fixture(scope='module')
+def corpus():
+    return create_synthetic_data()
+
+def make_pipeline(corpus, max_features=1000, labels=None):
+    labels = corpus['category'] if labels is None else labels
+    return Pipeline([
+        ('tfidf', LemmaTfidfVectorizer(
+            max_features=max_features, preprocessor=lemmatize_text, ngram_range=(1, 2), max_df=0.95
+        )),
+        ('classifier', LogisticRegression(max_iter=1000)),
+    ]).fit(corpus['text'], labels)
+
+def with_classifier(pipeline, corpus, labels):
+    """Copy of a pipeline sharing its fitted vectorizer, with a classifier fitted on other labels."""
+    pipeline = copy.deepcopy(pipeline)
+    X = pipeline.named_steps['tfidf'].transform(corpus['text'])
+    return pipeline.set_params(classifier=LogisticRegression(max_iter=1000).fit(X, labels))
+
+@pytest.fixture(scope='module')
+def pipeline(corpus):
+    return make_pipeline(corpus)
+
+@pytest.fixture
+def count_calls(monkeypatch):
+    """Count calls of a function or method, keyed by name."""
+    counts = {}
+
+    def patch(owner, name):
+        original = getattr(owner, name)
+        counts[name] = 0
+
+        def counted(*args, **kwargs):
+            counts[name] += 1
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(owner, name, counted)
+
+    patch.counts = counts
+    return patch
+
+def test_ab_routing_shares_and_stability(pipeline):
+    registry = ModelRegistry([
+        ServedModel('primary', pipeline),
+        ServedModel('variant', pipeline, role='ab', traffic=0.3),
+    ])
+    texts = [f"Document number {i} for routing" for i in range(5000)]
+    routes = [registry.route(text).name for text in texts]
+
+    assert routes.count('variant') / len(texts) == pytest.approx(0.3, abs=0.03)
+    assert [registry.route(text).name for text in texts] == routes
+    results = registry.classify(texts[:50])
+    assert [served_by.name for _, _, served_by in results] == routes[:50]
+
+def test_ab_traffic_above_one_is_rejected(pipeline):
+    with pytest.raises(ValueError):
+        ModelRegistry([
+            ServedModel('primary', pipeline),
+            ServedModel('a', pipeline, role='ab', traffic=0.6),
+            ServedModel('b', pipeline, role='ab', traffic=0.6),
+        ])
+
+def test_same_fingerprint_shares_one_transform(pipeline, corpus, count_calls):
+    shifted = corpus['category'].map(SHIFTED)
+    registry = ModelRegistry([
+        ServedModel('primary', pipeline),
+        ServedModel('variant', with_classifier(pipeline, corpus, corpus['category']), role='ab', traffic=0.5),
+        ServedModel('shadow', with_classifier(pipeline, corpus, shifted), role='shadow'),
+    ])
+    assert registry.describe()['featurization_groups'] == 1
+
+    count_calls(LemmaTfidfVectorizer, 'transform')
+    count_calls(LemmaTfidfVectorizer, 'transform_tokens')
+    results = registry.classify(list(corpus['text']))
+    registry.shutdown()
+
+    assert {served_by.name for _, _, served_by in results} == {'primary', 'variant'}
+    assert count_calls.counts == {'transform': 1, 'transform_tokens': 0}
+    assert registry.shadow_stats['shadow']['scored'] == len(corpus)
+
+def test_shadow_with_own_vocabulary_reuses_lemma_tokens(pipeline, corpus, count_calls):
+    registry = ModelRegistry([
+        ServedModel('primary', pipeline),
+        ServedModel('challenger', make_pipeline(corpus, max_features=500), role='shadow'),
+    ])
+    assert registry.describe()['featurization_groups'] == 2
+
+    count_calls(model_registry, 'lemma_tokens')
+    count_calls(LemmaTfidfVectorizer, '_token_ids')
+    registry.classify(list(corpus['text']))
+    registry.shutdown()
+
+    assert count_calls.counts == {'lemma_tokens': len(corpus), '_token_ids': 0}
+    assert registry.shadow_stats['challenger']['scored'] == len(corpus)
+
+def test_shadow_disagreements_are_counted(pipeline, corpus):
+    shadow_pipeline = with_classifier(pipeline, corpus, corpus['category'].map(SHIFTED))
+    registry = ModelRegistry([
+        ServedModel('primary', pipeline),
+        ServedModel('shadow', shadow_pipeline, role='shadow'),
+    ])
+    texts = list(corpus['text'])
+    registry.classify(texts)
+    registry.shutdown()
+
+    expected = int((pipeline.predict(texts) != shadow_pipeline.predict(texts)).sum())
+    assert expected > 0
+    assert registry.shadow_stats['shadow'] == {
+        'scored': len(texts), 'disagreements': expected, 'dropped': 0, 'errors': 0
+    }
+
+def test_shadow_requests_are_dropped_when_pool_is_full(pipeline):
+    registry = ModelRegistry(
+        [ServedModel('primary', pipeline), ServedModel('shadow', pipeline, role='shadow')],
+        shadow_max_pending=0
+    )
+    for _ in range(3):
+        registry.classify(["Office space rental agreement"])
+    registry.shutdown()
+
+    assert registry.shadow_stats['shadow']['dropped'] == 3
+    assert registry.shadow_stats['shadow']['scored'] == 0
+    assert registry.describe()['shadow_pending'] == 0
+
+def test_prefilter_hits_bypass_models_and_shadows(pipeline, count_calls):
+    prefilter = KeywordPrefilter(rules=[
+        {'anchor': 'prefix', 'words': ['supply', 'agreement'], 'category': 'contract', 'confidence': 0.99},
+    ])
+    registry = ModelRegistry(
+        [ServedModel('primary', pipeline), ServedModel('shadow', pipeline, role='shadow')],
+        prefilter=prefilter
+    )
+    count_calls(ServedModel, 'score')
+    results = registry.classify([
+        "Supply agreement between ABC Corp and XYZ Ltd",
+        "Lawsuit for debt collection under contract",
+    ])
+    registry.shutdown()
+
+    assert results[0] == ('contract', 0.99, prefilter)
+    assert results[1][2] is registry.primary
+    # Once for the primary and once for the shadow, for the second text only
+    assert count_calls.counts['score'] == 2
+    assert registry.shadow_stats['shadow']['scored'] == 1
+    assert prefilter.describe()['hits'] == 1
+
+def test_near_duplicate_hits_are_tied_to_model_name_and_version(pipeline):
+    index = NearDuplicateIndex(max_entries=100)
+    text = "Supply agreement between ABC Corp and XYZ Ltd for goods delivery"
+    near_duplicate = "Supply agreement between ABC Corp and XYZ Ltd for goods delivery."
+
+    registry = ModelRegistry(
+        [ServedModel('primary', pipeline, info={'training_date': 'v1'})], near_duplicates=index
+    )
+    first = registry.classify([text])[0]
+    second = registry.classify([near_duplicate])[0]
+    assert second == first
+    assert index.describe()['hits_by_model'] == {'primary@v1': 1}
+
+    # A/B variant: entries of the primary do not answer its texts
+    registry = ModelRegistry([
+        ServedModel('primary', pipeline, info={'training_date': 'v1'}),
+        ServedModel('variant', pipeline, info={'training_date': 'v1'}, role='ab', traffic=1.0),
+    ], near_duplicates=index)
+    assert registry.classify([text])[0][2].name == 'variant'
+    assert index.describe()['hits'] == 1
+
+    # A new version of the primary drops the entries of the old one
+    registry = ModelRegistry(
+        [ServedModel('primary', pipeline, info={'training_date': 'v2'})], near_duplicates=index
+    )
+    registry.classify([text])
+    stats = index.describe()
+    assert stats['hits'] == 1
+    assert stats['stale'] == 1
+    assert stats['entries'] == 2